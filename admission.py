@@ -0,0 +1,301 @@
+"""
+Admission control for the web apps.
+
+Every /generate request and /jobs submission takes a ticket before its flow
+runs. At most `max_in_flight` flows run at once and the rest wait in a
+priority queue, cheaper content types first (a tweet ahead of a blog post),
+oldest first within a class. When the queue is full, or a client already has
+`client_quota` requests queued or running, the request is rejected straight
+away with a 429 instead of piling up work the server cannot get to.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable
+
+from instrumentation import percentile
+
+
+# Priority class of each content type, lower runs first. Requests for several
+# content types take the class of the most expensive one.
+PRIORITIES = {"tweet": 0, "linkedin_post": 1, "blog_post": 2}
+
+# Key client quotas on the X-Client-ID header instead of the remote address.
+# Only safe behind a proxy that sets the header itself.
+TRUST_CLIENT_ID = os.getenv("TRUST_CLIENT_ID", "0") == "1"
+
+
+class AdmissionRejected(Exception):
+    """A request turned away by admission control. `status` and `retry_after` shape the HTTP response."""
+
+    def __init__(self, message: str, status: int = 429, retry_after: int = 1):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def client_identity(remote_addr: str | None, client_id: str | None = None) -> str:
+    """The identity client quotas are keyed on: the remote address, or X-Client-ID from a trusted proxy."""
+    if TRUST_CLIENT_ID and client_id:
+        return client_id
+    return remote_addr or "anonymous"
+
+
+def priority_of(inputs: dict) -> int:
+    content_types = inputs.get("content_types") or [inputs.get("content_type", "")]
+    lowest = max(PRIORITIES.values())
+    return max(PRIORITIES.get(content_type, lowest) for content_type in content_types)
+
+
+class Ticket:
+    """One request's place in the admission queue."""
+
+    def __init__(
+        self,
+        client: str,
+        priority: int,
+        on_grant: Callable[["Ticket"], None] | None = None,
+        on_timeout: Callable[["Ticket"], None] | None = None,
+    ):
+        self.client = client
+        self.priority = priority
+        self.on_grant = on_grant
+        self.on_timeout = on_timeout
+        self.state = "queued"  # queued, running, done or cancelled
+        self.queued_at = time.monotonic()
+        self.granted_at: float | None = None
+        self._granted = threading.Event()
+        # (loop, asyncio.Event) of coroutines waiting in AdmissionController.await_turn
+        self._async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+
+class AdmissionController:
+    """
+    Bounded, prioritized admission of flow runs. A client_quota of 0 means no
+    per-client limit. Queued requests give up after `queue_timeout` seconds:
+    waiters raise AdmissionRejected, and tickets admitted with an `on_timeout`
+    callback are dropped by a background thread that then calls it.
+    """
+
+    def __init__(self, max_in_flight: int = 8, max_queue: int = 32, client_quota: int = 0, queue_timeout: float = 30.0):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max_queue
+        self.client_quota = client_quota
+        self.queue_timeout = queue_timeout
+        self.counts = Counter()
+        self._queue: list[tuple[int, int, Ticket]] = []
+        self._order = itertools.count()
+        self._in_flight = 0
+        self._clients = Counter()
+        self._waits = deque(maxlen=1000)
+        self._service_times = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._reaper: threading.Thread | None = None
+
+    def admit(
+        self,
+        client: str,
+        inputs: dict,
+        on_grant: Callable[[Ticket], None] | None = None,
+        on_timeout: Callable[[Ticket], None] | None = None,
+    ) -> Ticket:
+        """
+        Queue a request, or raise AdmissionRejected without queueing it.
+        `on_grant(ticket)` is called once the request may run, possibly
+        before admit() returns. `on_timeout(ticket)` is called instead if the
+        request is still queued after `queue_timeout` seconds.
+        """
+        ticket = Ticket(client, priority_of(inputs), on_grant, on_timeout)
+        with self._lock:
+            if self.client_quota and self._clients[client] >= self.client_quota:
+                self.counts["rejected_quota"] += 1
+                raise AdmissionRejected("Too many requests from this client", retry_after=self._retry_after())
+            if self._in_flight >= self.max_in_flight and len(self._queue) >= self.max_queue:
+                self.counts["rejected_busy"] += 1
+                raise AdmissionRejected("Server is busy, try again later", retry_after=self._retry_after())
+
+            self.counts["admitted"] += 1
+            self._clients[client] += 1
+            heapq.heappush(self._queue, (ticket.priority, next(self._order), ticket))
+            if on_timeout is not None:
+                self._start_reaper()
+            granted = self._dispatch()
+        self._notify(granted)
+        return ticket
+
+    def wait(self, ticket: Ticket, timeout: float | None = None):
+        """Block until the ticket may run, or cancel it and raise AdmissionRejected after the queue timeout."""
+        if not ticket._granted.wait(self.queue_timeout if timeout is None else timeout):
+            self._give_up(ticket)
+
+    async def await_turn(self, ticket: Ticket, timeout: float | None = None):
+        """wait() for coroutines."""
+        loop = asyncio.get_running_loop()
+        waiter = asyncio.Event()
+        with self._lock:
+            if ticket.state == "queued":
+                ticket._async_waiters.append((loop, waiter))
+            else:
+                waiter.set()
+
+        try:
+            await asyncio.wait_for(waiter.wait(), self.queue_timeout if timeout is None else timeout)
+        except TimeoutError:
+            self._give_up(ticket)
+        except asyncio.CancelledError:
+            self.cancel(ticket)
+            raise
+
+    def release(self, ticket: Ticket):
+        """Free a running ticket's slot for the next queued request. Safe to call more than once."""
+        with self._lock:
+            if ticket.state != "running":
+                return
+            ticket.state = "done"
+            self._in_flight -= 1
+            self._leave(ticket)
+            self._service_times.append(time.monotonic() - ticket.granted_at)
+            granted = self._dispatch()
+        self._notify(granted)
+
+    def cancel(self, ticket: Ticket):
+        """Withdraw a queued ticket, or release it if it was granted in the meantime."""
+        with self._lock:
+            if ticket.state == "queued":
+                ticket.state = "cancelled"
+                self._queue = [entry for entry in self._queue if entry[2] is not ticket]
+                heapq.heapify(self._queue)
+                self._leave(ticket)
+                return
+        self.release(ticket)
+
+    @contextmanager
+    def slot(self, client: str, inputs: dict):
+        """Admit, wait for and release a ticket around a synchronous flow run."""
+        ticket = self.admit(client, inputs)
+        self.wait(ticket)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def aslot(self, client: str, inputs: dict):
+        """slot() for coroutines: waits without blocking the event loop."""
+        ticket = self.admit(client, inputs)
+        await self.await_turn(ticket)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def snapshot(self) -> dict:
+        names = {priority: content_type for content_type, priority in PRIORITIES.items()}
+        with self._lock:
+            queued = Counter(names.get(priority, str(priority)) for priority, _, _ in self._queue)
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "queued": len(self._queue),
+                "queued_by_class": dict(queued),
+                "max_queue": self.max_queue,
+                "clients": len(self._clients),
+                "admitted": self.counts["admitted"],
+                "rejected_busy": self.counts["rejected_busy"],
+                "rejected_quota": self.counts["rejected_quota"],
+                "timed_out": self.counts["timed_out"],
+                "queue_wait": {
+                    "p50": percentile(list(self._waits), 0.5),
+                    "p95": percentile(list(self._waits), 0.95),
+                },
+            }
+
+    def expire(self):
+        """Drop the tickets with an `on_timeout` callback queued longer than `queue_timeout`, and call it."""
+        cutoff = time.monotonic() - self.queue_timeout
+        with self._lock:
+            expired = [ticket for _, _, ticket in self._queue if ticket.on_timeout is not None and ticket.queued_at <= cutoff]
+            if expired:
+                self._queue = [entry for entry in self._queue if entry[2] not in expired]
+                heapq.heapify(self._queue)
+                for ticket in expired:
+                    ticket.state = "cancelled"
+                    self._leave(ticket)
+                self.counts["timed_out"] += len(expired)
+        for ticket in expired:
+            ticket.on_timeout(ticket)
+
+    def _start_reaper(self):
+        """Start the thread expiring queued callback tickets. Called with the lock held."""
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap, name="admission-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(max(0.05, min(1.0, self.queue_timeout / 4)))
+            self.expire()
+
+    def _give_up(self, ticket: Ticket):
+        with self._lock:
+            timed_out = ticket.state == "queued"
+            if timed_out:
+                self.counts["timed_out"] += 1
+        if timed_out:
+            self.cancel(ticket)
+            raise AdmissionRejected("Timed out waiting in the queue", status=503, retry_after=self._retry_after())
+
+    def _dispatch(self) -> list[Ticket]:
+        """Grant queued tickets while slots are free. Called with the lock held."""
+        granted = []
+        while self._queue and self._in_flight < self.max_in_flight:
+            _, _, ticket = heapq.heappop(self._queue)
+            ticket.state = "running"
+            ticket.granted_at = time.monotonic()
+            self._in_flight += 1
+            self._waits.append(ticket.granted_at - ticket.queued_at)
+            granted.append(ticket)
+        return granted
+
+    def _notify(self, granted: list[Ticket]):
+        """Wake the granted tickets' waiters. Called without the lock."""
+        for ticket in granted:
+            ticket._granted.set()
+            for loop, waiter in ticket._async_waiters:
+                loop.call_soon_threadsafe(waiter.set)
+            ticket._async_waiters.clear()
+            if ticket.on_grant is not None:
+                ticket.on_grant(ticket)
+
+    def _leave(self, ticket: Ticket):
+        self._clients[ticket.client] -= 1
+        if self._clients[ticket.client] <= 0:
+            del self._clients[ticket.client]
+
+    def _retry_after(self) -> int:
+        """Rough seconds until a slot frees up, from recent run times and the queue length."""
+        if not self._service_times:
+            return 1
+        average = sum(self._service_times) / len(self._service_times)
+        rounds = len(self._queue) // self.max_in_flight + 1
+        return max(1, round(average * rounds))
+
+
+def build_admission_controller(max_in_flight: int = 8) -> AdmissionController:
+    """
+    Build an admission controller from ADMISSION_MAX_IN_FLIGHT (defaults to
+    `max_in_flight`), ADMISSION_MAX_QUEUE (defaults to 4x max in flight),
+    ADMISSION_CLIENT_QUOTA (0 disables) and ADMISSION_QUEUE_TIMEOUT (seconds).
+    """
+    max_in_flight = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", str(max_in_flight)))
+    return AdmissionController(
+        max_in_flight=max_in_flight,
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", str(4 * max_in_flight))),
+        client_quota=int(os.getenv("ADMISSION_CLIENT_QUOTA", "0")),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30")),
+    )
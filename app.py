@@ -1,8 +1,64 @@
-from flask import Flask, render_template, request, jsonify
-from main import ContentPipelineFlow
+import json
+import os
+
+from flask import Flask, Response, render_template, request, jsonify, url_for
+from admission import AdmissionRejected, client_identity
+from instrumentation import configure_trace_log
+from jobs import admission, build_response, first_event_index, job_manager, load_flow, parse_inputs, preload_flow, server_metrics
+from results import cache_headers, etag_matches, generate_headers, get_entry, get_result, store_result, wants_fresh
 
 app = Flask(__name__)
 
+# Run without API keys against the offline stand-ins in fakes.py
+if os.getenv("FAKE_BACKENDS") == "1":
+    import fakes
+
+    fakes.install(llm_latency=float(os.getenv("FAKE_LLM_LATENCY", "0.5")))
+
+configure_trace_log()
+preload_flow()
+
+# Run flows in worker processes sharing SQLite caches instead of on this process' threads
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "0"))
+if WORKER_PROCESSES:
+    from workers import ProcessJobManager
+
+    job_manager = ProcessJobManager(
+        admission,
+        processes=WORKER_PROCESSES,
+        threads=int(os.getenv("WORKER_THREADS", "4")),
+        retention=float(os.getenv("JOB_RETENTION", "3600")),
+    )
+
+
+def _read_body() -> dict:
+    # A body that isn't a JSON object is treated as empty and fails validation with a 400
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
+
+def _read_inputs():
+    inputs, error = parse_inputs(_read_body())
+    if error:
+        return None, (jsonify({"error": error}), 400)
+    return inputs, None
+
+
+def _client_id() -> str:
+    return client_identity(request.remote_addr, request.headers.get("X-Client-ID"))
+
+
+def _force() -> bool:
+    return wants_fresh(_read_body(), request.headers.get("Cache-Control"))
+
+
+def _generate_headers(entry: dict, hit: bool) -> dict:
+    return generate_headers(entry, hit, url_for("result_content", key=entry["key"]))
+
+
+def _rejected(e: AdmissionRejected):
+    return jsonify({"error": str(e)}), e.status, {"Retry-After": str(e.retry_after)}
+
 
 @app.route("/")
 def index():
@@ -12,52 +68,111 @@ def index():
 @app.route("/generate", methods=["POST"])
 def generate():
     try:
-        data = request.json
-        topic = data.get("topic", "")
-        content_type = data.get("content_type", "")
-
-        if not topic or not content_type:
-            return jsonify({"error": "Topic and content type are required"}), 400
-
-        if content_type not in ["blog_post", "tweet", "linkedin_post"]:
-            return jsonify({"error": "Invalid content type"}), 400
-
-        # Run the flow
-        flow = ContentPipelineFlow()
-        result = flow.kickoff(inputs={"content_type": content_type, "topic": topic})
-
-        # Prepare response based on content type
-        response = {
-            "content_type": content_type,
-            "topic": topic,
-            "score": flow.state.score.score if flow.state.score else 0,
-            "reason": flow.state.score.reason if flow.state.score else "",
-        }
+        inputs, error = _read_inputs()
+        if error:
+            return error
+
+        # Serve finished content for a repeated request
+        entry = None if _force() else get_result(inputs)
+        if entry is not None:
+            return jsonify(entry["response"]), 200, _generate_headers(entry, hit=True)
+
+        if WORKER_PROCESSES:
+            # The job was admitted by the job manager, and its result cached when it finished
+            job = job_manager.submit(inputs, client=_client_id(), force=True)
+            job.wait()
+            if job.error is not None:
+                return jsonify({"error": job.error}), 500
+            entry = get_result(inputs) or store_result(inputs, job.result)
+            return jsonify(entry["response"]), 200, _generate_headers(entry, hit=False)
 
-        if content_type == "blog_post" and flow.state.blog_post:
-            response["content"] = {
-                "title": flow.state.blog_post.title,
-                "subtitle": flow.state.blog_post.subtitle,
-                "sections": flow.state.blog_post.sections,
-            }
-        elif content_type == "tweet" and flow.state.tweet:
-            response["content"] = {
-                "content": flow.state.tweet.content,
-                "hashtags": flow.state.tweet.hashtags,
-            }
-        elif content_type == "linkedin_post" and flow.state.linkedin_post:
-            response["content"] = {
-                "hook": flow.state.linkedin_post.hook,
-                "content": flow.state.linkedin_post.content,
-                "call_to_action": flow.state.linkedin_post.call_to_action,
-            }
-
-        return jsonify(response)
+        # Run the flow once admitted
+        with admission.slot(_client_id(), inputs):
+            flow = load_flow()()
+            flow.kickoff(inputs=inputs)
 
+        entry = store_result(inputs, build_response(flow.state))
+        return jsonify(entry["response"]), 200, _generate_headers(entry, hit=False)
+
+    except AdmissionRejected as e:
+        return _rejected(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+@app.route("/results/<key>")
+def result_content(key):
+    entry = get_entry(key)
+    if entry is None:
+        return jsonify({"error": "Result not found"}), 404
+
+    headers = cache_headers(entry)
+    if etag_matches(request.headers.get("If-None-Match"), entry["etag"]):
+        return "", 304, headers
+    return jsonify(entry["response"]), 200, headers
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    inputs, error = _read_inputs()
+    if error:
+        return error
+
+    try:
+        job = job_manager.submit(inputs, client=_client_id(), force=_force())
+    except AdmissionRejected as e:
+        return _rejected(e)
+
+    return jsonify(
+        {
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": url_for("job_status", job_id=job.id),
+            "events_url": url_for("job_events", job_id=job.id),
+        }
+    ), 202
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
 
+    return jsonify(job.to_dict())
+
+
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    start = first_event_index(request.headers.get("Last-Event-ID"))
+
+    def stream():
+        index = start
+        for event in job.iter_events(start=start):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {index}\nevent: {event['step']}\ndata: {json.dumps(event['data'])}\n\n"
+            index += 1
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/metrics")
+def get_metrics():
+    metrics = server_metrics(admission)
+    if WORKER_PROCESSES:
+        metrics["workers"] = job_manager.stats()
+    return jsonify(metrics)
+
+
+if __name__ == "__main__":
+    app.run(debug=True, port=5000, threaded=True)
@@ -0,0 +1,195 @@
+"""
+ASGI entry point serving the same routes as app.py.
+
+Flows run as tasks on the server's event loop instead of a thread each, so a
+single process can multiplex hundreds of concurrent flows:
+
+    uvicorn asgi:app --port 5000
+"""
+import asyncio
+import json
+import os
+
+from jinja2 import Environment, FileSystemLoader
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+from admission import AdmissionRejected, build_admission_controller, client_identity
+from instrumentation import configure_trace_log
+from jobs import AsyncJobManager, build_response, first_event_index, load_flow, parse_inputs, preload_flow, server_metrics
+from results import cache_headers, etag_matches, generate_headers, get_entry, get_result, store_result, wants_fresh
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Run without API keys against the offline stand-ins in fakes.py
+if os.getenv("FAKE_BACKENDS") == "1":
+    import fakes
+
+    fakes.install(llm_latency=float(os.getenv("FAKE_LLM_LATENCY", "0.5")))
+
+configure_trace_log()
+preload_flow()
+
+admission = build_admission_controller(max_in_flight=int(os.getenv("ASYNC_MAX_FLOWS", "256")))
+
+job_manager = AsyncJobManager(
+    admission,
+    retention=float(os.getenv("JOB_RETENTION", "3600")),
+)
+
+templates = Environment(loader=FileSystemLoader(os.path.join(BASE_DIR, "templates")), autoescape=True)
+
+
+async def _read_body(request: Request) -> dict:
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        data = {}
+    return data if isinstance(data, dict) else {}
+
+
+async def _read_inputs(request: Request):
+    inputs, error = parse_inputs(await _read_body(request))
+    if error:
+        return None, JSONResponse({"error": error}, status_code=400)
+    return inputs, None
+
+
+async def _force(request: Request) -> bool:
+    return wants_fresh(await _read_body(request), request.headers.get("Cache-Control"))
+
+
+def _client_id(request: Request) -> str:
+    return client_identity(request.client.host if request.client else None, request.headers.get("X-Client-ID"))
+
+
+def _generate_headers(request: Request, entry: dict, hit: bool) -> dict:
+    return generate_headers(entry, hit, request.url_for("result_content", key=entry["key"]).path)
+
+
+def _rejected(e: AdmissionRejected) -> JSONResponse:
+    return JSONResponse({"error": str(e)}, status_code=e.status, headers={"Retry-After": str(e.retry_after)})
+
+
+async def index(request: Request):
+    # The template is shared with the Flask app, which links assets with url_for('static', filename=...)
+    def url_for(endpoint: str, filename: str) -> str:
+        return str(request.url_for(endpoint, path=filename).path)
+
+    return HTMLResponse(templates.get_template("index.html").render(url_for=url_for))
+
+
+async def generate(request: Request):
+    try:
+        inputs, error = await _read_inputs(request)
+        if error:
+            return error
+
+        # Serve finished content for a repeated request
+        entry = None if await _force(request) else get_result(inputs)
+        if entry is not None:
+            return JSONResponse(entry["response"], headers=_generate_headers(request, entry, hit=True))
+
+        async with admission.aslot(_client_id(request), inputs):
+            flow_class = await asyncio.to_thread(load_flow)
+            flow = flow_class()
+            await flow.kickoff_async(inputs=inputs)
+
+        entry = store_result(inputs, build_response(flow.state))
+        return JSONResponse(entry["response"], headers=_generate_headers(request, entry, hit=False))
+
+    except AdmissionRejected as e:
+        return _rejected(e)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def result_content(request: Request):
+    entry = get_entry(request.path_params["key"])
+    if entry is None:
+        return JSONResponse({"error": "Result not found"}, status_code=404)
+
+    headers = cache_headers(entry)
+    if etag_matches(request.headers.get("If-None-Match"), entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(entry["response"], headers=headers)
+
+
+async def submit_job(request: Request):
+    inputs, error = await _read_inputs(request)
+    if error:
+        return error
+
+    try:
+        job = job_manager.submit(inputs, client=_client_id(request), force=await _force(request))
+    except AdmissionRejected as e:
+        return _rejected(e)
+
+    return JSONResponse(
+        {
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": request.url_for("job_status", job_id=job.id).path,
+            "events_url": request.url_for("job_events", job_id=job.id).path,
+        },
+        status_code=202,
+    )
+
+
+async def job_status(request: Request):
+    job = job_manager.get(request.path_params["job_id"])
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+
+    return JSONResponse(job.to_dict())
+
+
+async def job_events(request: Request):
+    job = job_manager.get(request.path_params["job_id"])
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+
+    start = first_event_index(request.headers.get("Last-Event-ID"))
+
+    async def stream():
+        index = start
+        async for event in job.aiter_events(start=start):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {index}\nevent: {event['step']}\ndata: {json.dumps(event['data'])}\n\n"
+            index += 1
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def get_metrics(request: Request):
+    return JSONResponse(server_metrics(admission))
+
+
+app = Starlette(
+    routes=[
+        Route("/", index),
+        Route("/generate", generate, methods=["POST"]),
+        Route("/results/{key}", result_content, name="result_content"),
+        Route("/jobs", submit_job, methods=["POST"]),
+        Route("/jobs/{job_id}", job_status, name="job_status"),
+        Route("/jobs/{job_id}/events", job_events, name="job_events"),
+        Route("/metrics", get_metrics),
+        Mount("/static", StaticFiles(directory=os.path.join(BASE_DIR, "static")), name="static"),
+    ]
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, port=5000)
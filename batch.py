@@ -0,0 +1,142 @@
+"""
+Run the content pipeline over a JSONL file of topics.
+
+Each input line is a JSON object with a `topic` and either a `content_type` or
+a list of `content_types`, plus an optional `id`. Results are appended to the
+output JSONL as each flow finishes, so an interrupted batch can be resumed by
+running the same command again: records that already succeeded are skipped.
+
+    python batch.py topics.jsonl results.jsonl --workers 8 --llm-concurrency 4 --llm-rate 120
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import configure_trace_log
+from jobs import build_response, load_flow
+from limits import llm_limiter
+
+
+def read_records(path: str):
+    """
+    Stream `(id, record, error)` triples from a JSONL file, skipping blank
+    lines. A line that isn't a JSON object comes back as `(line number, None,
+    error)` so the batch can record it and carry on.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield str(line_number), None, f"Invalid JSON on line {line_number}: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield str(line_number), None, f"Line {line_number} is not a JSON object"
+                continue
+            yield str(record.get("id", line_number)), record, None
+
+
+def completed_ids(path: str) -> set[str]:
+    """Ids that already succeeded in a previous run of the batch."""
+    if not os.path.exists(path):
+        return set()
+
+    done = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; the record will simply run again
+                continue
+            if entry.get("status") == "succeeded":
+                done.add(str(entry["id"]))
+    return done
+
+
+def run_record(record: dict) -> dict:
+    inputs = {"topic": record.get("topic", "")}
+    if record.get("content_types"):
+        inputs["content_types"] = record["content_types"]
+    else:
+        inputs["content_type"] = record.get("content_type", "")
+
+    flow = load_flow()()
+    flow.kickoff(inputs=inputs)
+    return build_response(flow.state)
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    workers: int = 4,
+    resume: bool = True,
+) -> dict:
+    skip = completed_ids(output_path) if resume else set()
+    counts = {"succeeded": 0, "failed": 0, "skipped": 0}
+
+    write_lock = threading.Lock()
+    # Bound the number of records read ahead of the workers so huge files stream
+    pending = threading.BoundedSemaphore(workers * 2)
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+
+        def write(entry: dict):
+            with write_lock:
+                out.write(json.dumps(entry) + "\n")
+                out.flush()
+                counts[entry["status"]] += 1
+                print(f"[{entry['status']}] {entry['id']} ({entry['elapsed']}s)")
+
+        def process(record_id: str, record: dict):
+            started = time.perf_counter()
+            try:
+                entry = {"id": record_id, "status": "succeeded", "result": run_record(record)}
+            except Exception as e:
+                entry = {"id": record_id, "status": "failed", "error": str(e), "record": record}
+            entry["elapsed"] = round(time.perf_counter() - started, 3)
+            write(entry)
+
+        def release(_):
+            pending.release()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+            for record_id, record, error in read_records(input_path):
+                if record_id in skip:
+                    counts["skipped"] += 1
+                    continue
+                if error is not None:
+                    write({"id": record_id, "status": "failed", "error": error, "elapsed": 0.0})
+                    continue
+                pending.acquire()
+                pool.submit(process, record_id, record).add_done_callback(release)
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the content pipeline over a JSONL file of topics.")
+    parser.add_argument("input", help="JSONL file of {topic, content_type} records")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--workers", type=int, default=4, help="flows run concurrently (default: 4)")
+    parser.add_argument("--llm-concurrency", type=int, default=0, help="max concurrent LLM calls across flows (default: unlimited)")
+    parser.add_argument("--llm-rate", type=float, default=0, help="max LLM calls per minute (default: unlimited)")
+    parser.add_argument("--restart", action="store_true", help="ignore previous results and start over")
+    args = parser.parse_args()
+
+    configure_trace_log()
+    if args.llm_concurrency or args.llm_rate:
+        llm_limiter.configure(args.llm_concurrency, args.llm_rate)
+
+    counts = run_batch(args.input, args.output, workers=args.workers, resume=not args.restart)
+    print(f"✅ Batch complete - {counts['succeeded']} succeeded, {counts['failed']} failed, {counts['skipped']} skipped")
+
+
+if __name__ == "__main__":
+    main()
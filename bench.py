@@ -0,0 +1,279 @@
+"""
+End-to-end benchmarks of the content pipeline against the offline fakes.
+
+Every LLM call and crew kickoff takes --llm-latency seconds and every web
+search --search-latency seconds, so the time a run spends beyond that is the
+pipeline's own overhead (flow orchestration, caching, prompt building,
+checkpoints, tracing, ...).
+
+    python bench.py single --runs 20 --llm-latency 0.05
+    python bench.py batch --runs 100 --workers 8
+    python bench.py flask --runs 200 --concurrency 16 --scores 5 6 8
+    python bench.py asgi --runs 500 --concurrency 200 --llm-latency 0.5
+    python bench.py all --json bench.json
+    python bench.py imports --runs 5
+"""
+import os
+
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fakes
+from batch import run_batch
+from checkpoints import CheckpointStore, set_checkpoint_store
+from instrumentation import percentile
+from main import ContentPipelineFlow
+
+
+class TraceCollector(logging.Handler):
+    """Collects the run traces logged by instrumentation.finish_trace."""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.traces = []
+        self._lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord):
+        with self._lock:
+            self.traces.append(json.loads(record.getMessage()))
+
+    def drain(self) -> list[dict]:
+        with self._lock:
+            traces, self.traces = self.traces, []
+        return traces
+
+
+def summarize(name: str, latencies: list[float], wall: float, traces: list[dict], failed: int, args) -> dict:
+    # Overhead is the run's time outside the fakes' simulated waits, measured rather than
+    # derived from call counts, since concurrent calls within a run overlap
+    overheads = [trace["duration"] - fakes.waited_seconds(trace["run_id"]) for trace in traces]
+    llm_calls = [trace["totals"]["llm_calls"] for trace in traces]
+    return {
+        "scenario": name,
+        "runs": len(latencies),
+        "failed": failed,
+        "wall_seconds": wall,
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p99": percentile(latencies, 0.99),
+        "overhead_p50": percentile(overheads, 0.5),
+        "overhead_p99": percentile(overheads, 0.99),
+        "llm_calls_per_run": sum(llm_calls) / len(llm_calls) if llm_calls else 0.0,
+    }
+
+
+# Numbers topics across scenarios so one scenario never hits another's research cache
+_topic_numbers = itertools.count()
+
+
+def topics(args) -> list[str]:
+    if args.same_topic:
+        return [args.topic] * args.runs
+    return [f"{args.topic} {next(_topic_numbers)}" for _ in range(args.runs)]
+
+
+def bench_single(args, collector: TraceCollector) -> dict:
+    """Flows run one after another in this thread."""
+    latencies = []
+    failed = 0
+    started = time.perf_counter()
+    for topic in topics(args):
+        run_started = time.perf_counter()
+        try:
+            ContentPipelineFlow().kickoff(inputs={"topic": topic, "content_type": args.content_type})
+        except Exception:
+            failed += 1
+        latencies.append(time.perf_counter() - run_started)
+    wall = time.perf_counter() - started
+    return summarize("single", latencies, wall, collector.drain(), failed, args)
+
+
+def bench_batch(args, collector: TraceCollector) -> dict:
+    """The batch runner over a generated JSONL file."""
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, "topics.jsonl")
+        output_path = os.path.join(directory, "results.jsonl")
+        with open(input_path, "w", encoding="utf-8") as f:
+            for topic in topics(args):
+                f.write(json.dumps({"topic": topic, "content_type": args.content_type}) + "\n")
+
+        started = time.perf_counter()
+        counts = run_batch(input_path, output_path, workers=args.workers, resume=False)
+        wall = time.perf_counter() - started
+
+        with open(output_path, encoding="utf-8") as f:
+            latencies = [json.loads(line)["elapsed"] for line in f]
+
+    return summarize("batch", latencies, wall, collector.drain(), counts["failed"], args)
+
+
+def bench_flask(args, collector: TraceCollector) -> dict:
+    """Concurrent clients posting to the web app's /generate endpoint."""
+    from app import app
+
+    client_local = threading.local()
+
+    def request(topic: str) -> tuple[float, bool]:
+        if not hasattr(client_local, "client"):
+            client_local.client = app.test_client()
+        run_started = time.perf_counter()
+        response = client_local.client.post("/generate", json={"topic": topic, "content_type": args.content_type})
+        return time.perf_counter() - run_started, response.status_code == 200
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(request, topics(args)))
+    wall = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in results]
+    failed = sum(1 for _, ok in results if not ok)
+    return summarize("flask", latencies, wall, collector.drain(), failed, args)
+
+
+def bench_asgi(args, collector: TraceCollector) -> dict:
+    """Concurrent clients posting to the ASGI app's /generate endpoint, all flows on one event loop."""
+    import httpx
+
+    from asgi import app
+
+    async def run() -> list[tuple[float, bool]]:
+        slots = asyncio.Semaphore(args.concurrency)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+            async def request(topic: str) -> tuple[float, bool]:
+                async with slots:
+                    run_started = time.perf_counter()
+                    response = await client.post("/generate", json={"topic": topic, "content_type": args.content_type})
+                    return time.perf_counter() - run_started, response.status_code == 200
+
+            return await asyncio.gather(*(request(topic) for topic in topics(args)))
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+    wall = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in results]
+    failed = sum(1 for _, ok in results if not ok)
+    return summarize("asgi", latencies, wall, collector.drain(), failed, args)
+
+
+SCENARIOS = {"single": bench_single, "batch": bench_batch, "flask": bench_flask, "asgi": bench_asgi}
+
+# Entry points and crews whose cold import time the imports benchmark measures
+IMPORT_MODULES = ["app", "asgi", "batch", "resume", "main", "research_crew", "seo_crew", "virality_crew"]
+
+
+def import_seconds(module: str) -> float:
+    """Seconds a fresh interpreter takes to import `module`, without the web apps' background preload."""
+    code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+    env = {**os.environ, "PRELOAD_FLOW": "0"}
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.split()[-1])
+
+
+def bench_imports(args) -> list[dict]:
+    results = []
+    for module in IMPORT_MODULES:
+        seconds = [import_seconds(module) for _ in range(args.runs)]
+        results.append(
+            {
+                "module": module,
+                "runs": args.runs,
+                "import_p50": percentile(seconds, 0.5),
+                "import_min": min(seconds),
+                "import_max": max(seconds),
+            }
+        )
+    return results
+
+
+def print_import_report(results: list[dict]):
+    print(f"{'module':<14} {'runs':>5} {'p50 s':>8} {'min s':>8} {'max s':>8}")
+    for r in results:
+        print(f"{r['module']:<14} {r['runs']:>5} {r['import_p50']:>8.3f} {r['import_min']:>8.3f} {r['import_max']:>8.3f}")
+
+
+def print_report(results: list[dict]):
+    print(
+        f"{'scenario':<8} {'runs':>5} {'failed':>6} {'runs/s':>8} {'p50 s':>8} {'p99 s':>8} "
+        f"{'ovh p50':>8} {'ovh p99':>8} {'llm/run':>8}"
+    )
+    for r in results:
+        print(
+            f"{r['scenario']:<8} {r['runs']:>5} {r['failed']:>6} {r['throughput']:>8.2f} "
+            f"{r['latency_p50']:>8.3f} {r['latency_p99']:>8.3f} "
+            f"{r['overhead_p50']:>8.3f} {r['overhead_p99']:>8.3f} {r['llm_calls_per_run']:>8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the content pipeline against offline fake backends.")
+    parser.add_argument("scenario", choices=[*SCENARIOS, "all", "imports"])
+    parser.add_argument("--runs", type=int, default=20, help="flows per scenario, or imports per module (default: 20)")
+    parser.add_argument("--content-type", default="tweet", help="content type generated (default: tweet)")
+    parser.add_argument("--topic", default="AI agents in content marketing")
+    parser.add_argument("--same-topic", action="store_true", help="reuse one topic so research caches hit")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per LLM call or crew kickoff")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="seconds per web search")
+    parser.add_argument("--scores", type=int, nargs="+", default=[8], help="audit score of each revision")
+    parser.add_argument("--workers", type=int, default=4, help="batch workers (default: 4)")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent Flask/ASGI clients (default: 8)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the flows' console output")
+    args = parser.parse_args()
+
+    if args.scenario == "imports":
+        results = bench_imports(args)
+        print_import_report(results)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+        return
+
+    fakes.install(llm_latency=args.llm_latency, search_latency=args.search_latency, scores=args.scores)
+
+    collector = TraceCollector()
+    trace_logger = logging.getLogger("content_pipeline.trace")
+    trace_logger.addHandler(collector)
+    trace_logger.setLevel(logging.INFO)
+    trace_logger.propagate = False
+
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        set_checkpoint_store(CheckpointStore(os.path.join(directory, "checkpoints.db")))
+        for name in names:
+            output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with output:
+                results.append(SCENARIOS[name](args, collector))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from pydantic import BaseModel
+
+
+def normalize_topic(topic: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace so trivially different topics share a key."""
+    return " ".join(re.sub(r"[^\w\s]", " ", topic.lower()).split())
+
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    sets: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class NullCache:
+    """Cache that never stores anything. Used when a cache is disabled."""
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key: str):
+        self.stats.misses += 1
+        return None
+
+    def set(self, key: str, value):
+        pass
+
+    def delete(self, key: str):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class MemoryCache:
+    """In-process LRU cache with per-entry TTL and entry/byte based eviction."""
+
+    def __init__(self, max_entries: int = 256, ttl: float | None = 3600, max_bytes: int | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, tuple[float | None, int, object]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            expires_at, _, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value):
+        size = _size_of(value)
+        expires_at = time.time() + self.ttl if self.ttl else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+            self.stats.sets += 1
+
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+class SqliteCache:
+    """On-disk cache backed by a SQLite table. Values must be JSON serializable."""
+
+    def __init__(
+        self,
+        path: str,
+        table: str = "cache",
+        max_entries: int = 1024,
+        ttl: float | None = 86400,
+        max_bytes: int | None = None,
+    ):
+        if not re.fullmatch(r"\w+", table):
+            raise ValueError(f"Invalid cache table name: {table!r}")
+
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # WAL lets other processes read the cache while one of them writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.stats.misses += 1
+                return None
+
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+
+            self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats.hits += 1
+            return json.loads(value)
+
+    def set(self, key: str, value):
+        payload = json.dumps(value)
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), expires_at, now),
+            )
+            self.stats.sets += 1
+            self._evict()
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def _evict(self):
+        expired = self._conn.execute(
+            f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        ).rowcount
+        self.stats.expirations += expired
+
+        count, total = self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        while count > self.max_entries or (self.max_bytes is not None and total > self.max_bytes):
+            key, size = self._conn.execute(
+                f"SELECT key, size FROM {self.table} ORDER BY accessed_at ASC LIMIT 1"
+            ).fetchone()
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self.stats.evictions += 1
+            count -= 1
+            total -= size
+
+
+def _size_of(value) -> int:
+    if isinstance(value, str):
+        return len(value)
+    try:
+        return len(json.dumps(value))
+    except TypeError:
+        return 0
+
+
+def build_cache(name: str, backend: str | None = None):
+    """
+    Build the cache called `name` from environment variables, with `backend`
+    overriding <NAME>_CACHE_BACKEND when given:
+
+        <NAME>_CACHE_BACKEND      memory (default), sqlite or none
+        <NAME>_CACHE_TTL          seconds, 0 disables expiry
+        <NAME>_CACHE_MAX_ENTRIES
+        <NAME>_CACHE_MAX_BYTES
+        <NAME>_CACHE_PATH         sqlite file (default .cache/content_pipeline.db)
+    """
+    prefix = f"{name.upper()}_CACHE_"
+    backend = (backend or os.getenv(prefix + "BACKEND", "memory")).lower()
+    ttl = float(os.getenv(prefix + "TTL", "3600")) or None
+    max_entries = int(os.getenv(prefix + "MAX_ENTRIES", "256"))
+    max_bytes = os.getenv(prefix + "MAX_BYTES")
+    max_bytes = int(max_bytes) if max_bytes else None
+
+    if backend == "none":
+        return NullCache()
+    if backend == "sqlite":
+        path = os.getenv(prefix + "PATH", os.path.join(".cache", "content_pipeline.db"))
+        return SqliteCache(path, table=name, max_entries=max_entries, ttl=ttl, max_bytes=max_bytes)
+    if backend == "memory":
+        return MemoryCache(max_entries=max_entries, ttl=ttl, max_bytes=max_bytes)
+
+    raise ValueError(f"Invalid cache backend '{backend}'. Must be 'memory', 'sqlite', or 'none'.")
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str):
+    """Return the process-wide cache called `name`, building it on first use."""
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = build_cache(name)
+        return _caches[name]
+
+
+def set_cache(name: str, cache):
+    """Replace the process-wide cache called `name` (e.g. with a SqliteCache or a NullCache)."""
+    with _caches_lock:
+        _caches[name] = cache
+
+
+def cache_stats() -> dict:
+    with _caches_lock:
+        return {name: {**cache.stats.model_dump(), "size": len(cache)} for name, cache in _caches.items()}
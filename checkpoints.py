@@ -0,0 +1,128 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class CheckpointStore:
+    """
+    SQLite store holding the latest ContentPipelineState of each flow run,
+    saved after every completed step so a run can be resumed after a crash.
+    Finished runs are deleted `retention` seconds after they finish (at once
+    with 0); running and failed runs are kept for resuming.
+    """
+
+    def __init__(self, path: str, retention: float = 86400):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # Worker processes checkpoint to the same file
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                run_id TEXT PRIMARY KEY,
+                step TEXT NOT NULL,
+                status TEXT NOT NULL,
+                state TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def save(self, run_id: str, step: str, state: str, status: str = "running"):
+        """Save `state` (JSON) as the checkpoint of `run_id` after `step`."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (run_id, step, status, state, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (run_id, step, status, state, time.time()),
+            )
+            self._conn.commit()
+
+    def set_status(self, run_id: str, status: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE checkpoints SET status = ?, updated_at = ? WHERE run_id = ?",
+                (status, time.time(), run_id),
+            )
+            self._conn.commit()
+        if status == "finished":
+            self.prune()
+
+    def prune(self) -> int:
+        """Delete the finished runs older than `retention`. Returns how many were deleted."""
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM checkpoints WHERE status = 'finished' AND updated_at <= ?",
+                (time.time() - self.retention,),
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def load(self, run_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT step, status, state, updated_at FROM checkpoints WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        step, status, state, updated_at = row
+        return {"run_id": run_id, "step": step, "status": status, "state": json.loads(state), "updated_at": updated_at}
+
+    def list(self, status: str | None = None, limit: int = 50) -> list[dict]:
+        query = "SELECT run_id, step, status, updated_at FROM checkpoints"
+        params = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY updated_at DESC LIMIT ?"
+
+        with self._lock:
+            rows = self._conn.execute(query, (*params, limit)).fetchall()
+        return [
+            {"run_id": run_id, "step": step, "status": status, "updated_at": updated_at}
+            for run_id, step, status, updated_at in rows
+        ]
+
+    def delete(self, run_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+            self._conn.commit()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore | None:
+    """
+    Return the process-wide checkpoint store, or None when checkpointing is
+    disabled with CHECKPOINTS=0. The file defaults to .cache/checkpoints.db
+    and can be moved with CHECKPOINT_PATH. Finished runs are kept for
+    CHECKPOINT_RETENTION seconds (default one day).
+    """
+    global _store
+    if os.getenv("CHECKPOINTS", "1") == "0":
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = CheckpointStore(
+                os.getenv("CHECKPOINT_PATH", os.path.join(".cache", "checkpoints.db")),
+                retention=float(os.getenv("CHECKPOINT_RETENTION", "86400")),
+            )
+        return _store
+
+
+def set_checkpoint_store(store: CheckpointStore | None):
+    global _store
+    with _store_lock:
+        _store = store
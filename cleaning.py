@@ -0,0 +1,179 @@
+import hashlib
+import os
+import re
+from itertools import chain, zip_longest
+from typing import Iterable, Iterator
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+CHARS_PER_TOKEN = 4
+
+# Markdown links, bare URLs and escape backslashes are dropped; any run of
+# whitespace (including newlines) collapses to a single space. One pattern,
+# one pass over each paragraph.
+_CLEAN_PATTERN = re.compile(r"(\s+)|\[[^\]]*\]\([^)]*\)|https?://[^\s)\]]+|\\+")
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+_WORD = re.compile(r"\w+")
+
+DEFAULT_MAX_CHARS_PER_RESULT = int(os.getenv("SEARCH_RESULT_MAX_CHARS", "3000"))
+DEFAULT_MAX_TOTAL_CHARS = int(os.getenv("SEARCH_TOTAL_MAX_CHARS", "10000"))
+
+# Query parameters that track the visit rather than select the page
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "yclid", "ref_src"}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _replace(match: re.Match) -> str:
+    return " " if match.group(1) else ""
+
+
+def clean_text(text: str) -> str:
+    return _CLEAN_PATTERN.sub(_replace, text).strip()
+
+
+def iter_paragraphs(markdown: str) -> Iterator[str]:
+    """Yield cleaned, non-empty paragraphs lazily so callers can stop once their budget is spent."""
+    start = 0
+    for match in _PARAGRAPH_BREAK.finditer(markdown):
+        paragraph = clean_text(markdown[start:match.start()])
+        if paragraph:
+            yield paragraph
+        start = match.end()
+
+    paragraph = clean_text(markdown[start:])
+    if paragraph:
+        yield paragraph
+
+
+def fingerprint(paragraph: str) -> str:
+    """Case, punctuation and whitespace insensitive fingerprint used to spot near-identical paragraphs."""
+    words = _WORD.findall(paragraph.lower())
+    return hashlib.sha1(" ".join(words).encode()).hexdigest()
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[: cut if cut > 0 else limit].rstrip()
+
+
+def clean_markdown(
+    markdown: str,
+    max_chars: int | None = None,
+    seen: set[str] | None = None,
+) -> str:
+    """
+    Clean a single page of markdown, skipping paragraphs whose fingerprint is
+    already in `seen` and stopping once `max_chars` have been produced.
+    """
+    seen = set() if seen is None else seen
+    parts = []
+    used = 0
+
+    for paragraph in iter_paragraphs(markdown or ""):
+        key = fingerprint(paragraph)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        if max_chars is not None:
+            remaining = max_chars - used - (1 if parts else 0)
+            if remaining <= 0:
+                break
+            paragraph = _truncate(paragraph, remaining)
+            if not paragraph:
+                break
+
+        parts.append(paragraph)
+        used += len(paragraph) + (1 if len(parts) > 1 else 0)
+
+    return "\n".join(parts)
+
+
+def clean_results(
+    results: Iterable[dict],
+    max_chars_per_result: int | None = DEFAULT_MAX_CHARS_PER_RESULT,
+    max_total_chars: int | None = DEFAULT_MAX_TOTAL_CHARS,
+    max_tokens_per_result: int | None = None,
+    max_total_tokens: int | None = None,
+) -> list[dict]:
+    """
+    Clean search results into `{title, url, markdown}` chunks within per-result
+    and total budgets. Token budgets are converted to characters and, when
+    given, take precedence. Paragraphs repeated across results are kept once.
+    """
+    if max_tokens_per_result is not None:
+        max_chars_per_result = max_tokens_per_result * CHARS_PER_TOKEN
+    if max_total_tokens is not None:
+        max_total_chars = max_total_tokens * CHARS_PER_TOKEN
+
+    seen: set[str] = set()
+    cleaned_chunks = []
+    used = 0
+
+    for result in results:
+        budget = max_chars_per_result
+        if max_total_chars is not None:
+            remaining = max_total_chars - used
+            if remaining <= 0:
+                break
+            budget = remaining if budget is None else min(budget, remaining)
+
+        cleaned = clean_markdown(result.get("markdown") or "", max_chars=budget, seen=seen)
+        if not cleaned:
+            continue
+
+        used += len(cleaned)
+        cleaned_chunks.append(
+            {
+                "title": result.get("title", ""),
+                "url": result.get("url", ""),
+                "markdown": cleaned,
+            }
+        )
+
+    return cleaned_chunks
+
+
+def normalize_url(url: str) -> str:
+    """
+    Scheme, host case, "www.", fragment, trailing slash and tracking parameter
+    insensitive form of a URL. The path and the remaining query parameters
+    are kept as they are, since they can select different pages.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith("utm_") and name.lower() not in TRACKING_PARAMS
+    ]
+    normalized = f"{host}{parts.path.rstrip('/')}"
+    return f"{normalized}?{urlencode(sorted(query))}" if query else normalized
+
+
+def merge_results(result_lists: Iterable[list[dict]]) -> Iterator[dict]:
+    """
+    Merge the results of several searches, taking them round-robin so every
+    query's top results come first, and skipping pages already seen under
+    the same URL or with the same content.
+    """
+    seen_urls: set[str] = set()
+    seen_content: set[str] = set()
+
+    for result in chain.from_iterable(zip_longest(*result_lists)):
+        if result is None:
+            continue
+
+        url = normalize_url(result.get("url") or "")
+        content = fingerprint(result.get("markdown") or "")
+        if (url and url in seen_urls) or content in seen_content:
+            continue
+
+        if url:
+            seen_urls.add(url)
+        seen_content.add(content)
+        yield result
@@ -0,0 +1,15 @@
+"""
+Settings shared by the flow and the web apps. Kept free of heavy imports, so
+the web apps can validate requests and key the results cache without loading
+crewai.
+"""
+
+CONTENT_TYPES = ["blog_post", "tweet", "linkedin_post"]
+
+MODEL = "gpt-5-nano"
+
+# Words ignored when matching a draft or an earlier topic against a topic
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "its", "of", "on", "or", "s", "that", "the", "to", "what", "when", "why", "with", "your",
+}
@@ -0,0 +1,49 @@
+"""
+Research distillation: the full research report is reduced once to a ranked
+list of key facts, and each content type's prompts get only as many of them
+as that format can use.
+"""
+import hashlib
+import os
+from typing import List
+
+from pydantic import BaseModel
+
+from cleaning import estimate_tokens
+
+
+# Key facts handed to the generation prompts of each content type
+DIGEST_FACTS = {"tweet": 5, "linkedin_post": 10, "blog_post": 20}
+MAX_FACT_WORDS = 30
+
+# Reports shorter than this are used as they are
+DISTILL_MIN_TOKENS = int(os.getenv("DISTILL_MIN_TOKENS", "600"))
+DISTILL = os.getenv("DISTILL", "1") != "0"
+
+
+class KeyFacts(BaseModel):
+    facts: List[str]
+
+
+def needs_distilling(research: str) -> bool:
+    return estimate_tokens(research) > DISTILL_MIN_TOKENS
+
+
+def distill_key(research: str, model: str) -> str:
+    """Cache key of a report's key facts; the report itself is too large to use as a key."""
+    return hashlib.sha1(f"{model}\n{research}".encode()).hexdigest()
+
+
+def distill_prompt(topic: str, research: str) -> str:
+    return f"""
+    Extract the key facts from the following research on the topic {topic}. Return at most {max(DIGEST_FACTS.values())} facts, ordered from most to least important. Each fact should be a single self-contained sentence of at most {MAX_FACT_WORDS} words and keep any concrete numbers, names, dates and sources. Leave out anything not directly related to the topic.
+
+    <research>
+    {research}
+    </research>
+    """
+
+
+def digest_for(content_type: str, facts: List[str]) -> str:
+    """The top facts for `content_type`, as a bullet list."""
+    return "\n".join(f"- {fact}" for fact in facts[: DIGEST_FACTS[content_type]])
@@ -0,0 +1,345 @@
+"""
+Offline stand-ins for OpenAI, the crews and Firecrawl.
+
+They return valid, deterministic BlogPost/Tweet/LinkedInPost/Score objects
+after a configurable delay, so the flow, the web app and the batch runner can
+be exercised and benchmarked without API keys:
+
+    import fakes
+    fakes.install(llm_latency=0.2, scores=[5, 6, 8])
+
+Each draft carries a revision marker such as "(v2)", and the audit crews
+return the score of that revision from `scores` (the last one repeats), so a
+flow regenerates the same number of times no matter how many run at once.
+"""
+import asyncio
+import re
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import List
+
+from cleaning import clean_results, estimate_tokens
+from distill import KeyFacts
+from instrumentation import current_trace
+from main import BlogPost, LinkedInPost, Score, SectionFeedback, SectionRewrite, Tweet
+from registry import set_crew_factory, set_llm_factory
+from research import SearchPlan
+import streaming
+from search import asearch, search, set_async_search_client, set_search_client
+
+
+# run id -> (start, end) of every simulated wait during the run
+_waits: dict[str, list[tuple[float, float]]] = defaultdict(list)
+_waits_lock = threading.Lock()
+
+
+def _record_wait(started: float):
+    trace = current_trace()
+    if trace is None:
+        return
+    with _waits_lock:
+        _waits[trace.run_id].append((started, time.perf_counter()))
+
+
+def _sleep(seconds: float):
+    started = time.perf_counter()
+    time.sleep(seconds)
+    _record_wait(started)
+
+
+async def _asleep(seconds: float):
+    started = time.perf_counter()
+    await asyncio.sleep(seconds)
+    _record_wait(started)
+
+
+def waited_seconds(run_id: str) -> float:
+    """
+    Wall time the run `run_id` spent waiting on at least one fake, counting
+    overlapping waits (best-of-N candidates, fan-out branches, parallel
+    searches) once. Forgets the run.
+    """
+    with _waits_lock:
+        intervals = sorted(_waits.pop(run_id, []))
+    total = 0.0
+    covered_until = float("-inf")
+    for start, end in intervals:
+        if end > covered_until:
+            total += end - max(start, covered_until)
+            covered_until = end
+    return total
+
+
+_TOPIC = re.compile(r"on the topic (.+?)\.\s")
+_REVISION = re.compile(r"\(v(\d+)\)")
+_STOPWORDS = {"a", "an", "and", "for", "in", "of", "on", "the", "to", "with"}
+
+SENTENCES = [
+    "{topic} has moved from experiments to everyday practice for many teams.",
+    "Recent surveys show adoption of {topic} roughly doubling year over year.",
+    "Experts point to tooling, cost and trust as the main hurdles for {topic}.",
+    "Early adopters of {topic} report faster delivery and fewer manual steps.",
+    "The next wave of {topic} will be shaped by regulation and open standards.",
+    "Teams that measure outcomes get far more value out of {topic} than those that chase trends.",
+]
+
+
+def topic_of(text: str) -> str:
+    match = _TOPIC.search(text)
+    return match.group(1).strip() if match else "the topic"
+
+
+def revision_of(text: str) -> int:
+    """Latest revision marker found in `text`, 0 when there is none."""
+    revisions = [int(revision) for revision in _REVISION.findall(text)]
+    return max(revisions, default=0)
+
+
+def _paragraph(topic: str, start: int, count: int) -> str:
+    return " ".join(SENTENCES[(start + i) % len(SENTENCES)].format(topic=topic) for i in range(count))
+
+
+def _hashtags(topic: str) -> str:
+    words = [word for word in re.findall(r"\w+", topic) if word.lower() not in _STOPWORDS]
+    return " ".join(f"#{word.capitalize()}" for word in words[:3]) or "#Content"
+
+
+def fake_feedback(revision: int) -> list[SectionFeedback]:
+    """SEO feedback flagging one section of a fake blog post, a different one each revision."""
+    section = (revision - 1) % 4 + 1
+    return [SectionFeedback(part="section", section=section, feedback=f"Section {section} lacks concrete examples.")]
+
+
+def fake_content(response_format, topic: str, revision: int):
+    marker = f"(v{revision})"
+    if response_format is BlogPost:
+        return BlogPost(
+            title=f"{topic.title()}: What Changes Next {marker}",
+            subtitle=f"A practical look at {topic} and where it is heading",
+            sections=[_paragraph(topic, start, 5) for start in range(4)],
+        )
+    if response_format is Tweet:
+        return Tweet(content=f"{topic} is moving faster than most teams expect {marker}", hashtags=_hashtags(topic))
+    if response_format is LinkedInPost:
+        return LinkedInPost(
+            hook=f"Most teams are underestimating {topic} {marker}",
+            content=_paragraph(topic, 0, 5),
+            call_to_action=f"How is your team approaching {topic}? Share your thoughts below.",
+        )
+    if response_format is SectionRewrite:
+        return SectionRewrite(text=f"{_paragraph(topic, revision, 5)} {marker}")
+    if response_format is SearchPlan:
+        return SearchPlan(queries=[f"{topic} {aspect}" for aspect in ("statistics", "trends", "expert opinions", "case studies")])
+    if response_format is KeyFacts:
+        return KeyFacts(facts=[sentence.format(topic=topic) for sentence in SENTENCES])
+    return _paragraph(topic, 0, 3)
+
+
+class FakeLLM:
+    """Drop-in for crewai's LLM: `call(prompt)` sleeps `latency` seconds and returns a valid `response_format`."""
+
+    def __init__(self, model: str, response_format=None, latency: float = 0.0):
+        self.model = model
+        self.response_format = response_format
+        self.latency = latency
+
+    def call(self, prompt: str):
+        _sleep(self.latency)
+        return fake_content(self.response_format, topic_of(prompt), revision_of(prompt) + 1)
+
+    async def acall(self, prompt: str):
+        await _asleep(self.latency)
+        return fake_content(self.response_format, topic_of(prompt), revision_of(prompt) + 1)
+
+
+class FakeCrewOutput:
+    def __init__(self, pydantic=None, json_dict: dict | None = None, prompt: str = "", completion: str = ""):
+        self.pydantic = pydantic
+        self.json_dict = json_dict
+        self.token_usage = SimpleNamespace(
+            prompt_tokens=estimate_tokens(prompt),
+            completion_tokens=estimate_tokens(completion),
+            successful_requests=1,
+        )
+
+    def __getitem__(self, key: str):
+        if self.json_dict is not None:
+            return self.json_dict[key]
+        return getattr(self.pydantic, key)
+
+
+class FakeResearchCrew:
+    """Researches through the real search() path, so search caching and cleaning are part of the run."""
+
+    def __init__(self, topic: str, latency: float = 0.0):
+        self.topic = topic
+        self.latency = latency
+
+    def kickoff(self, inputs: dict | None = None) -> FakeCrewOutput:
+        _sleep(self.latency)
+        return self._output(search(self.topic, limit=5))
+
+    async def akickoff(self, inputs: dict | None = None) -> FakeCrewOutput:
+        await _asleep(self.latency)
+        return self._output(await asearch(self.topic, limit=5))
+
+    def _output(self, results: list[dict]) -> FakeCrewOutput:
+        chunks = clean_results(results)
+        research = "\n\n".join(f"{chunk['title']}\n{chunk['markdown']}" for chunk in chunks)
+        return FakeCrewOutput(json_dict={"research": research}, prompt=self.topic, completion=research)
+
+
+class FakeCrewStreamingOutput:
+    """What a streaming crew's akickoff() returns: iterates text chunks of the final answer, then holds the result."""
+
+    def __init__(self, result: FakeCrewOutput, latency: float, steps: int = 5):
+        self.result = result
+        self.latency = latency
+        self.steps = steps
+
+    async def __aiter__(self):
+        text = "Thought: I now know the final answer\nFinal Answer: " + self.result.pydantic.model_dump_json()
+        size = -(-len(text) // self.steps)
+        for start in range(0, len(text), size):
+            await _asleep(self.latency / self.steps)
+            yield SimpleNamespace(content=text[start : start + size], tool_call=None)
+
+
+class FakeAuditCrew:
+    """SEO/virality crew returning `scores[revision - 1]` for the audited draft."""
+
+    def __init__(self, scores: List[int], latency: float = 0.0):
+        self.scores = list(scores) or [10]
+        self.latency = latency
+        self.stream = False
+
+    def kickoff(self, inputs: dict | None = None) -> FakeCrewOutput:
+        _sleep(self.latency)
+        return self._output(inputs)
+
+    async def akickoff(self, inputs: dict | None = None) -> FakeCrewOutput | FakeCrewStreamingOutput:
+        if self.stream:
+            return FakeCrewStreamingOutput(self._output(inputs), self.latency)
+        await _asleep(self.latency)
+        return self._output(inputs)
+
+    def _output(self, inputs: dict | None) -> FakeCrewOutput:
+        content = " ".join(str(value) for value in (inputs or {}).values())
+        revision = max(1, revision_of(content))
+        score = self.scores[min(revision, len(self.scores)) - 1]
+        feedback = fake_feedback(revision) if "blog_post" in (inputs or {}) else []
+        result = Score(score=score, reason=f"Revision {revision} scored {score}/10.", feedback=feedback)
+        return FakeCrewOutput(pydantic=result, prompt=content, completion=result.reason)
+
+
+class FakeStream:
+    """What `client.beta.chat.completions.stream(...)` returns: iterates content.delta events, then the final completion."""
+
+    def __init__(self, result, latency: float, steps: int = 5):
+        self.result = result
+        self.latency = latency
+        self.steps = steps
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        fields = self.result.model_dump()
+        partial = {}
+        for name, value in fields.items():
+            words = value.split() if isinstance(value, str) else None
+            for step in range(1, self.steps + 1):
+                _sleep(self.latency / (self.steps * len(fields)))
+                if words is None:
+                    partial[name] = value
+                    break
+                partial[name] = " ".join(words[: len(words) * step // self.steps])
+                yield SimpleNamespace(type="content.delta", parsed=dict(partial))
+            if words is None:
+                yield SimpleNamespace(type="content.delta", parsed=dict(partial))
+
+    def get_final_completion(self):
+        text = self.result.model_dump_json()
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=0, completion_tokens=estimate_tokens(text)),
+            choices=[SimpleNamespace(message=SimpleNamespace(parsed=self.result))],
+        )
+
+
+class FakeStreamingClient:
+    """OpenAI client stand-in for streaming.stream_structured(), drafting like FakeLLM."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.beta = SimpleNamespace(chat=SimpleNamespace(completions=self))
+
+    def stream(self, model: str, messages: list[dict], response_format, **kwargs) -> FakeStream:
+        prompt = "\n".join(message["content"] for message in messages)
+        result = fake_content(response_format, topic_of(prompt), revision_of(prompt) + 1)
+        return FakeStream(result, self.latency)
+
+
+class FakeSearchClient:
+    """Firecrawl stand-in serving a canned corpus, with the links and repeated boilerplate of real pages."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def search(self, query: str, limit: int = 5, formats: list[str] | None = None):
+        _sleep(self.latency)
+        return self._response(query, limit)
+
+    def _response(self, query: str, limit: int):
+        slug = "-".join(re.findall(r"\w+", query.lower()))
+        data = [
+            {
+                "url": f"https://example.com/{slug}/{i}",
+                "title": f"{query} ({i})",
+                "description": SENTENCES[i % len(SENTENCES)].format(topic=query),
+                "markdown": "\n\n".join(
+                    [
+                        f"# {query}",
+                        _paragraph(query, i, 3),
+                        f"Read more in [our report](https://example.com/{slug}/report) or https://example.com/{slug}.",
+                        "Subscribe to our newsletter for weekly updates.",
+                    ]
+                ),
+            }
+            for i in range(limit)
+        ]
+        return SimpleNamespace(success=True, data=data)
+
+
+class AsyncFakeSearchClient(FakeSearchClient):
+    async def search(self, query: str, limit: int = 5, formats: list[str] | None = None):
+        await _asleep(self.latency)
+        return self._response(query, limit)
+
+
+def install(llm_latency: float = 0.0, search_latency: float = 0.0, scores: List[int] = (8,)):
+    """
+    Route every LLM call, crew and web search of this process to the fakes.
+    Each LLM call and crew kickoff takes `llm_latency` seconds and each
+    search `search_latency` seconds.
+    """
+    set_llm_factory(lambda model, response_format=None: FakeLLM(model, response_format, llm_latency))
+    set_crew_factory("research", lambda topic: FakeResearchCrew(topic, llm_latency))
+    set_crew_factory("seo", lambda: FakeAuditCrew(scores, llm_latency))
+    set_crew_factory("virality", lambda: FakeAuditCrew(scores, llm_latency))
+    set_search_client(FakeSearchClient(search_latency))
+    set_async_search_client(AsyncFakeSearchClient(search_latency))
+    streaming.set_client(FakeStreamingClient(llm_latency))
+
+
+def uninstall():
+    set_llm_factory(None)
+    for name in ("research", "seo", "virality"):
+        set_crew_factory(name, None)
+    set_search_client(None)
+    set_async_search_client(None)
+    streaming.set_client(None)
@@ -0,0 +1,283 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from cleaning import estimate_tokens
+
+
+logger = logging.getLogger("content_pipeline.trace")
+
+# USD per 1M (prompt, completion) tokens
+PRICES = {
+    "gpt-5-nano": (0.05, 0.40),
+    "gpt-5-mini": (0.25, 2.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# Model used by crew agents that don't set an explicit llm
+CREW_MODEL = os.getenv("OPENAI_MODEL_NAME", "gpt-4o-mini")
+
+
+def cost_of(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class StepRecord(BaseModel):
+    name: str
+    content_type: str = ""
+    iteration: int = 0
+    started_at: float = Field(default_factory=time.time)
+    duration: float = 0.0
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tokens_estimated: bool = False
+    cost: float = 0.0
+    search_calls: int = 0
+    error: str | None = None
+
+
+class RunTrace(BaseModel):
+    run_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    topic: str = ""
+    content_types: List[str] = []
+    started_at: float = Field(default_factory=time.time)
+    duration: float = 0.0
+    steps: List[StepRecord] = []
+    error: str | None = None
+
+    def totals(self) -> dict:
+        return {
+            "llm_calls": sum(step.llm_calls for step in self.steps),
+            "prompt_tokens": sum(step.prompt_tokens for step in self.steps),
+            "completion_tokens": sum(step.completion_tokens for step in self.steps),
+            "cost": sum(step.cost for step in self.steps),
+            "search_calls": sum(step.search_calls for step in self.steps),
+        }
+
+    def to_dict(self) -> dict:
+        return {**self.model_dump(), "totals": self.totals()}
+
+
+_current_step: ContextVar[StepRecord | None] = ContextVar("current_step", default=None)
+_current_trace: ContextVar[RunTrace | None] = ContextVar("current_trace", default=None)
+_record_lock = threading.Lock()
+
+
+@contextmanager
+def step_span(trace: RunTrace, name: str):
+    """Time a flow step and collect the LLM/search usage recorded while it runs."""
+    record = StepRecord(name=name)
+    token = _current_step.set(record)
+    trace_token = _current_trace.set(trace)
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record.error = str(e)
+        raise
+    finally:
+        record.duration = time.perf_counter() - started
+        _current_step.reset(token)
+        _current_trace.reset(trace_token)
+        with _record_lock:
+            trace.steps.append(record)
+
+
+def current_trace() -> RunTrace | None:
+    """The trace of the flow run whose step is executing, if any."""
+    return _current_trace.get()
+
+
+def traced(content_type: str | None = None):
+    """
+    Record a ContentPipelineFlow method, sync or async, as a step of the
+    flow's trace. The content type comes from `content_type`, else the
+    method's first argument when it is a string, else the flow state.
+    """
+
+    def decorator(method):
+        name = method.__name__.lstrip("_")
+
+        def step_content_type(self, args) -> str:
+            if content_type is not None:
+                return content_type
+            return args[0] if args and isinstance(args[0], str) else self.state.content_type
+
+        if inspect.iscoroutinefunction(method):
+
+            @functools.wraps(method)
+            async def async_wrapper(self, *args, **kwargs):
+                record_content_type = step_content_type(self, args)
+                with step_span(self.trace, name) as record:
+                    record.content_type = record_content_type
+                    try:
+                        return await method(self, *args, **kwargs)
+                    finally:
+                        record.iteration = self.state.iterations.get(record_content_type, 0)
+
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            record_content_type = step_content_type(self, args)
+            with step_span(self.trace, name) as record:
+                record.content_type = record_content_type
+                try:
+                    return method(self, *args, **kwargs)
+                finally:
+                    # Read after the call since generation steps bump the iteration
+                    record.iteration = self.state.iterations.get(record_content_type, 0)
+
+        return wrapper
+
+    return decorator
+
+
+def record_llm_call(model: str, prompt_tokens: int, completion_tokens: int, estimated: bool = False, calls: int = 1):
+    record = _current_step.get()
+    if record is None:
+        return
+    with _record_lock:
+        record.llm_calls += calls
+        record.prompt_tokens += prompt_tokens
+        record.completion_tokens += completion_tokens
+        record.tokens_estimated = record.tokens_estimated or estimated
+        record.cost += cost_of(model, prompt_tokens, completion_tokens)
+
+
+def record_llm_text(model: str, prompt: str, completion: str):
+    """Record an LLM call whose usage isn't reported, estimating tokens from the text."""
+    record_llm_call(model, estimate_tokens(prompt), estimate_tokens(completion), estimated=True)
+
+
+def crew_usage(crew):
+    """
+    The UsageMetrics a crew's agents have accumulated so far, or None. Agent
+    LLMs count tokens for their whole life, so a pooled crew reports every
+    earlier kickoff too.
+    """
+    calculate = getattr(crew, "calculate_usage_metrics", None)
+    return calculate() if calculate is not None else None
+
+
+def record_crew_usage(usage, model: str = CREW_MODEL, before=None):
+    """Record the UsageMetrics of a finished crew kickoff, less the `before` snapshot taken ahead of it."""
+    if usage is None:
+        return
+
+    def used(field: str) -> int:
+        return (getattr(usage, field, 0) or 0) - (getattr(before, field, 0) or 0)
+
+    record_llm_call(model, used("prompt_tokens"), used("completion_tokens"), calls=used("successful_requests"))
+
+
+def record_search_call():
+    record = _current_step.get()
+    if record is None:
+        return
+    with _record_lock:
+        record.search_calls += 1
+
+
+def percentile(values: list[float], q: float) -> float:
+    """The `q` quantile (0-1) of `values` by nearest rank, 0.0 when there are none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """Aggregates finished run traces for the web app's /metrics endpoint."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self.runs = 0
+        self.failed_runs = 0
+        self.totals = {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0, "search_calls": 0}
+        self._run_durations = deque(maxlen=window)
+        self._step_durations: dict[str, deque] = {}
+        self._step_counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, trace: RunTrace):
+        with self._lock:
+            self.runs += 1
+            if trace.error:
+                self.failed_runs += 1
+            self._run_durations.append(trace.duration)
+            for key, value in trace.totals().items():
+                self.totals[key] += value
+            for step in trace.steps:
+                self._step_durations.setdefault(step.name, deque(maxlen=self.window)).append(step.duration)
+                self._step_counts[step.name] = self._step_counts.get(step.name, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "failed_runs": self.failed_runs,
+                "totals": dict(self.totals),
+                "run_duration": {
+                    "p50": percentile(list(self._run_durations), 0.5),
+                    "p95": percentile(list(self._run_durations), 0.95),
+                },
+                "steps": {
+                    name: {
+                        "count": self._step_counts[name],
+                        "p50": percentile(list(durations), 0.5),
+                        "p95": percentile(list(durations), 0.95),
+                    }
+                    for name, durations in self._step_durations.items()
+                },
+            }
+
+
+metrics = Metrics()
+
+
+def configure_trace_log():
+    """
+    Send the per-run JSON traces to TRACE_LOG: stderr (default), stdout, a
+    file path to append to, or none. Called by the entry points; safe to call
+    more than once.
+    """
+    target = os.getenv("TRACE_LOG", "stderr")
+    if target.lower() == "none" or logger.handlers:
+        return
+
+    if target.lower() == "stderr":
+        handler = logging.StreamHandler()
+    elif target.lower() == "stdout":
+        handler = logging.StreamHandler(sys.stdout)
+    else:
+        handler = logging.FileHandler(target)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    # The lines are already complete; don't repeat them through the app's root handlers
+    logger.propagate = False
+
+
+def finish_trace(trace: RunTrace, error: Exception | None = None):
+    """Close a run trace: emit it as one JSON log line and add it to the aggregate metrics."""
+    trace.duration = time.time() - trace.started_at
+    if error is not None:
+        trace.error = str(error)
+    logger.info(json.dumps(trace.to_dict()))
+    metrics.record(trace)
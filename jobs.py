@@ -0,0 +1,393 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from admission import AdmissionController, Ticket, build_admission_controller
+from cache import cache_stats
+from constants import CONTENT_TYPES
+from instrumentation import metrics
+from registry import registry_stats
+from results import get_result, store_result
+from semantic import topic_index
+
+if TYPE_CHECKING:
+    from main import ContentPipelineFlow, ContentPipelineState
+
+
+def load_flow() -> type["ContentPipelineFlow"]:
+    """
+    The flow class. main.py and crewai are imported on first use rather than
+    with this module, since importing them takes seconds.
+    """
+    from main import ContentPipelineFlow
+
+    return ContentPipelineFlow
+
+
+def preload_flow():
+    """
+    Import the flow in a background thread (unless PRELOAD_FLOW=0), so a new
+    worker starts serving at once and the flow is loaded by its first request.
+    """
+    if os.getenv("PRELOAD_FLOW", "1") != "0":
+        threading.Thread(target=load_flow, name="preload-flow", daemon=True).start()
+
+
+def parse_inputs(data: dict) -> tuple[dict | None, str | None]:
+    """Validate a web request body into flow inputs. Returns (inputs, None) or (None, error message)."""
+    topic = data.get("topic", "")
+    content_type = data.get("content_type", "")
+    content_types = data.get("content_types") or []
+
+    # "all" fans out to every content type from a single research pass
+    if content_type == "all":
+        content_type, content_types = "", CONTENT_TYPES
+
+    if not topic or not (content_type or content_types):
+        return None, "Topic and content type are required"
+
+    if content_types:
+        if not isinstance(content_types, list) or any(t not in CONTENT_TYPES for t in content_types):
+            return None, "Invalid content type"
+        inputs = {"content_types": list(dict.fromkeys(content_types)), "topic": topic}
+    elif content_type not in CONTENT_TYPES:
+        return None, "Invalid content type"
+    else:
+        inputs = {"content_type": content_type, "topic": topic}
+
+    # Stream partial drafts and audit reasoning over the job's event stream
+    if data.get("stream"):
+        inputs["stream"] = True
+
+    return inputs, None
+
+
+def first_event_index(last_event_id: str | None) -> int:
+    """Index of the first event to replay to an SSE client that reconnected with `last_event_id`."""
+    try:
+        return max(0, int(last_event_id) + 1)
+    except (TypeError, ValueError):
+        return 0
+
+
+def build_response(state: "ContentPipelineState") -> dict:
+    """Shape a finished flow state into the JSON returned by the web app."""
+    if len(state.content_types) > 1:
+        return {
+            "content_types": state.content_types,
+            "topic": state.topic,
+            "results": {
+                content_type: _content_response(state, content_type)
+                for content_type in state.content_types
+            },
+        }
+
+    return _content_response(state, state.content_type)
+
+
+def _content_response(state: "ContentPipelineState", content_type: str) -> dict:
+    score = state.scores.get(content_type, state.score)
+    response = {
+        "content_type": content_type,
+        "topic": state.topic,
+        "score": score.score if score else 0,
+        "reason": score.reason if score else "",
+    }
+
+    if content_type == "blog_post" and state.blog_post:
+        response["content"] = {
+            "title": state.blog_post.title,
+            "subtitle": state.blog_post.subtitle,
+            "sections": state.blog_post.sections,
+        }
+    elif content_type == "tweet" and state.tweet:
+        response["content"] = {
+            "content": state.tweet.content,
+            "hashtags": state.tweet.hashtags,
+        }
+    elif content_type == "linkedin_post" and state.linkedin_post:
+        response["content"] = {
+            "hook": state.linkedin_post.hook,
+            "content": state.linkedin_post.content,
+            "call_to_action": state.linkedin_post.call_to_action,
+        }
+
+    return response
+
+
+def server_metrics(admission: AdmissionController | None = None) -> dict:
+    """Flow, admission, cache and registry statistics served by the web apps' /metrics endpoint."""
+    return {
+        "flows": metrics.snapshot(),
+        "admission": admission.snapshot() if admission is not None else None,
+        "caches": cache_stats(),
+        "topic_index": {**topic_index.stats.model_dump(), "size": len(topic_index)} if topic_index is not None else None,
+        "registry": registry_stats(),
+    }
+
+
+class Job:
+
+    def __init__(self, inputs: dict):
+        self.id = uuid.uuid4().hex
+        self.inputs = inputs
+        self.status = "queued"
+        self.result: dict | None = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.finished_at: float | None = None
+        self.events: list[dict] = []
+        self._condition = threading.Condition()
+        # (loop, asyncio.Event) of coroutines waiting in aiter_events
+        self._async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def add_event(self, step: str, data: dict | None = None):
+        with self._condition:
+            self.events.append({"step": step, "data": data or {}, "time": time.time()})
+            self._notify()
+
+    def _notify(self):
+        self._condition.notify_all()
+        for loop, event in self._async_waiters:
+            loop.call_soon_threadsafe(event.set)
+        self._async_waiters.clear()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until the job is done. False if `timeout` seconds passed first."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.done, timeout)
+
+    def finish(self, result: dict | None = None, error: str | None = None):
+        with self._condition:
+            self.result = result
+            self.error = error
+            self.status = "failed" if error is not None else "succeeded"
+            self.finished_at = time.time()
+            self.events.append(
+                {
+                    "step": "error" if error is not None else "done",
+                    "data": {"error": error} if error is not None else result,
+                    "time": self.finished_at,
+                }
+            )
+            self._notify()
+
+    def iter_events(self, start: int = 0, heartbeat: float = 15.0):
+        """
+        Yield events from index `start` as they are recorded, ending after the
+        final done/error event. Yields None every `heartbeat` seconds of silence
+        so callers can keep idle connections alive.
+        """
+        index = start
+        while True:
+            with self._condition:
+                if index >= len(self.events):
+                    self._condition.wait(timeout=heartbeat)
+                pending = self.events[index:]
+                index += len(pending)
+                finished = self.done and index >= len(self.events)
+
+            if not pending:
+                yield None
+            for event in pending:
+                yield event
+
+            if finished:
+                return
+
+    async def aiter_events(self, start: int = 0, heartbeat: float = 15.0):
+        """iter_events() for coroutines: waits for new events without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        index = start
+        while True:
+            waiter = asyncio.Event()
+            with self._condition:
+                waiting = index >= len(self.events) and not self.done
+                if waiting:
+                    self._async_waiters.append((loop, waiter))
+
+            if waiting:
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=heartbeat)
+                except TimeoutError:
+                    pass
+
+            with self._condition:
+                if (loop, waiter) in self._async_waiters:
+                    self._async_waiters.remove((loop, waiter))
+                pending = self.events[index:]
+                index += len(pending)
+                finished = self.done and index >= len(self.events)
+
+            if not pending:
+                yield None
+            for event in pending:
+                yield event
+
+            if finished:
+                return
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "inputs": self.inputs,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class BaseJobManager:
+    """Keeps submitted jobs around for polling until `retention` seconds after they finish."""
+
+    def __init__(self, retention: float = 3600):
+        self.retention = retention
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _cached(self, inputs: dict, force: bool) -> Job | None:
+        """An already finished job serving the cached content for `inputs`, unless `force` is set."""
+        entry = None if force else get_result(inputs)
+        if entry is None:
+            return None
+        job = Job(inputs)
+        job.finish(result=entry["response"])
+        return self._add(job)
+
+    @staticmethod
+    def _timed_out(job: Job):
+        """on_timeout callback of a job's admission ticket."""
+        return lambda ticket: job.finish(error="Timed out waiting in the queue")
+
+    def _add(self, job: Job) -> Job:
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        return job
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self._jobs.items()):
+            if job.done and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+
+class JobManager(BaseJobManager):
+    """
+    Runs content pipeline flows on a thread pool and keeps their progress
+    around for polling. Jobs wait in `admission`'s queue and only reach the
+    pool once admitted.
+    """
+
+    def __init__(self, admission: AdmissionController, max_workers: int | None = None, retention: float = 3600):
+        super().__init__(retention)
+        self.admission = admission
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or admission.max_in_flight, thread_name_prefix="content-pipeline"
+        )
+
+    def submit(self, inputs: dict, client: str = "anonymous", force: bool = False) -> Job:
+        """
+        Queue a flow run, or finish the job at once from the results cache.
+        Raises AdmissionRejected when the admission queue turns it away.
+        """
+        cached = self._cached(inputs, force)
+        if cached is not None:
+            return cached
+
+        job = Job(inputs)
+        self.admission.admit(
+            client,
+            inputs,
+            on_grant=lambda ticket: self._executor.submit(self._run, job, ticket),
+            on_timeout=self._timed_out(job),
+        )
+        return self._add(job)
+
+    def _run(self, job: Job, ticket: Ticket):
+        job.status = "running"
+        job.add_event("started", job.inputs)
+        try:
+            flow = load_flow()(on_step=job.add_event)
+            flow.kickoff(inputs=job.inputs)
+            job.finish(result=store_result(job.inputs, build_response(flow.state))["response"])
+        except Exception as e:
+            job.finish(error=str(e))
+        finally:
+            self.admission.release(ticket)
+
+
+class AsyncJobManager(BaseJobManager):
+    """
+    Runs content pipeline flows as tasks on the running event loop, so one
+    process can multiplex many flows without a thread per flow. A task is
+    only started once `admission` lets the job run. submit() must be called
+    from the loop.
+    """
+
+    def __init__(self, admission: AdmissionController, retention: float = 3600):
+        super().__init__(retention)
+        self.admission = admission
+        # Strong references, since the loop only keeps weak ones to running tasks
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, inputs: dict, client: str = "anonymous", force: bool = False) -> Job:
+        """
+        Queue a flow run, or finish the job at once from the results cache.
+        Raises AdmissionRejected when the admission queue turns it away.
+        """
+        cached = self._cached(inputs, force)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        job = Job(inputs)
+        # Slots can be freed from other threads, so start the task through the loop
+        self.admission.admit(
+            client,
+            inputs,
+            on_grant=lambda ticket: loop.call_soon_threadsafe(self._start, job, ticket),
+            on_timeout=self._timed_out(job),
+        )
+        return self._add(job)
+
+    def _start(self, job: Job, ticket: Ticket):
+        task = asyncio.get_running_loop().create_task(self._run(job, ticket))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: Job, ticket: Ticket):
+        job.status = "running"
+        job.add_event("started", job.inputs)
+        try:
+            flow_class = await asyncio.to_thread(load_flow)
+            flow = flow_class(on_step=job.add_event)
+            await flow.kickoff_async(inputs=job.inputs)
+            job.finish(result=store_result(job.inputs, build_response(flow.state))["response"])
+        except Exception as e:
+            job.finish(error=str(e))
+        finally:
+            self.admission.release(ticket)
+
+
+admission = build_admission_controller()
+
+job_manager = JobManager(
+    admission,
+    max_workers=int(os.getenv("JOB_WORKERS", "0")),
+    retention=float(os.getenv("JOB_RETENTION", "3600")),
+)
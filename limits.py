@@ -0,0 +1,103 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+
+# Seconds between attempts of a coroutine waiting for a concurrency slot
+SLOT_POLL_INTERVAL = 0.01
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while (wait := self._try_acquire()) > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        while (wait := self._try_acquire()) > 0:
+            await asyncio.sleep(wait)
+
+    def _try_acquire(self) -> float:
+        """Take a token and return 0, or return how long to wait before one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class LLMLimiter:
+    """
+    Process-wide cap on concurrent LLM bound steps plus an optional rate limit.
+    A max_concurrency or rate_per_minute of 0 means unlimited.
+    """
+
+    def __init__(self, max_concurrency: int = 0, rate_per_minute: float = 0):
+        self.configure(max_concurrency, rate_per_minute)
+
+    def configure(self, max_concurrency: int = 0, rate_per_minute: float = 0):
+        self.max_concurrency = max_concurrency
+        self.rate_per_minute = rate_per_minute
+        self._semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+        self._rate_limiter = (
+            RateLimiter(rate_per_minute / 60, burst=max(1, max_concurrency)) if rate_per_minute > 0 else None
+        )
+
+    @contextmanager
+    def slot(self):
+        semaphore = self._semaphore
+        if semaphore is not None:
+            semaphore.acquire()
+        try:
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire()
+            yield
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """slot() for coroutines: waits without blocking the event loop."""
+        semaphore = self._semaphore
+        if semaphore is not None:
+            # The semaphore is shared with threads, so poll it instead of blocking
+            while not semaphore.acquire(blocking=False):
+                await asyncio.sleep(SLOT_POLL_INTERVAL)
+        try:
+            if self._rate_limiter is not None:
+                await self._rate_limiter.aacquire()
+            yield
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+
+llm_limiter = LLMLimiter(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "0")),
+    rate_per_minute=float(os.getenv("LLM_RATE_PER_MINUTE", "0")),
+)
+
+
+def llm_slot():
+    """Context manager to hold around every LLM call or crew kickoff."""
+    return llm_limiter.slot()
+
+
+def allm_slot():
+    """Async context manager to hold around every awaited LLM call or crew kickoff."""
+    return llm_limiter.aslot()
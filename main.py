@@ -1,11 +1,33 @@
-from typing import List
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, List
 from crewai.flow.flow import Flow, listen, start, router, and_, or_
 from crewai import LLM
 from pydantic import BaseModel
 
-from research_crew import ResearchCrew
-from seo_crew import SeoCrew
-from virality_crew import ViralityCrew
+from cache import get_cache, normalize_topic
+from constants import CONTENT_TYPES, MODEL
+from checkpoints import get_checkpoint_store
+from distill import DISTILL, KeyFacts, digest_for, distill_key, distill_prompt, needs_distilling
+from instrumentation import RunTrace, configure_trace_log, crew_usage, finish_trace, record_crew_usage, record_llm_text, traced
+from limits import allm_slot
+from prescore import prescore
+from registry import build_crew, crew_pool, get_llm
+from research import (
+    RESEARCH_MODE,
+    RESEARCH_MODES,
+    RESULTS_PER_QUERY,
+    SearchPlan,
+    build_corpus,
+    plan_prompt,
+    plan_queries,
+    synthesis_prompt,
+)
+from search import asearch
+from semantic import topic_index
+from streaming import PARTIAL_INTERVAL, partial_score, stream_structured
 
 
 class BlogPost(BaseModel):
@@ -22,20 +44,98 @@ class LinkedInPost(BaseModel):
     content: str
     call_to_action: str
 
+class SectionFeedback(BaseModel):
+    part: str  # "title", "subtitle" or "section"
+    section: int  # 1-based section number, 0 for the title and subtitle
+    feedback: str
+
+class SectionRewrite(BaseModel):
+    text: str
+
 class Score(BaseModel):
     score: int = 0
     reason: str = ""
+    feedback: List[SectionFeedback] = []  # per-part SEO feedback on blog posts
+
+MAX_LENGTHS = {
+    "tweet": 100,
+    "linkedin_post": 500,
+    "blog_post": 800,
+}
+
+CONTENT_TYPE_OF = {
+    BlogPost: "blog_post",
+    Tweet: "tweet",
+    LinkedInPost: "linkedin_post",
+}
+
+SCORE_THRESHOLD = 7
+
+# Regeneration loop limits; 0 disables a limit
+MAX_ITERATIONS = int(os.getenv("MAX_ITERATIONS", "5"))
+TIME_BUDGET = float(os.getenv("TIME_BUDGET", "0"))
+COST_BUDGET = float(os.getenv("COST_BUDGET", "0"))
+PLATEAU_PATIENCE = int(os.getenv("PLATEAU_PATIENCE", "2"))
+
+# Best-of-N: drafts generated and scored concurrently per round
+NUM_CANDIDATES = int(os.getenv("NUM_CANDIDATES", "1"))
+
+# Reject clearly failing drafts with local heuristics before the LLM audits
+PRESCORE = os.getenv("PRESCORE", "1") != "0"
+
+# Regenerate only the blog post parts the SEO audit flagged
+SECTION_REGENERATION = os.getenv("SECTION_REGENERATION", "1") != "0"
+
+
+# The crews are imported when first built rather than with this module
+def _research_crew(topic: str):
+    from research_crew import ResearchCrew
+
+    return ResearchCrew(topic=topic).crew()
+
+
+def _seo_crew():
+    from seo_crew import SeoCrew
+
+    return SeoCrew().crew()
+
+
+def _virality_crew():
+    from virality_crew import ViralityCrew
+
+    return ViralityCrew().crew()
+
 
 class ContentPipelineState(BaseModel):
 
     # Inputs
     content_type: str = ""
+    content_types: List[str] = []
     topic: str = ""
 
+    # Limits
+    max_iterations: int = MAX_ITERATIONS
+    time_budget: float = TIME_BUDGET  # seconds per run
+    cost_budget: float = COST_BUDGET  # USD per run
+    plateau_patience: int = PLATEAU_PATIENCE  # rounds without a better score
+    num_candidates: int = NUM_CANDIDATES
+    prescore: bool = PRESCORE
+    stream: bool = False  # push partial drafts and audit reasoning to on_step as tokens arrive
+    distill: bool = DISTILL  # prompt with key facts instead of the full research report
+    research_mode: str = RESEARCH_MODE  # "crew" or "parallel"
+    section_regeneration: bool = SECTION_REGENERATION  # rewrite only the flagged blog post parts
+
     # Internal
     max_length: int = 0
     research: str = ""
+    key_facts: List[str] = []  # distilled from research, most important first
     score: Score | None = None
+    scores: Dict[str, Score] = {}
+    iterations: Dict[str, int] = {}
+    score_history: Dict[str, List[int]] = {}
+    best_scores: Dict[str, Score] = {}
+    best_content: Dict[str, BlogPost | Tweet | LinkedInPost] = {}
+    stop_reasons: Dict[str, str] = {}
 
     # Content
     blog_post: BlogPost | None = None
@@ -43,40 +143,278 @@ class ContentPipelineState(BaseModel):
     linkedin_post: LinkedInPost | None = None
 
 
+# The generate/check steps are routers rather than listeners: only a router's
+# return value fires the next event ("tweet_ready", "score_ready", ...).
 class ContentPipelineFlow(Flow[ContentPipelineState]):
 
+    def __init__(self, on_step: Callable[[str, dict], None] | None = None, **kwargs):
+        super().__init__(**kwargs)
+        self.on_step = on_step
+        self.trace = RunTrace(run_id=self.flow_id)
+        # Scores of best-of-N winners, already computed while generating
+        self._pending_scores: dict[str, Score] = {}
+        self._checkpoints = get_checkpoint_store()
+        # Held while fan-out branches update shared state and while it is checkpointed
+        self._state_lock = threading.RLock()
+        # Keeps the checkpoints of concurrent branches in the order they were taken
+        self._checkpoint_lock = asyncio.Lock()
+
+    @classmethod
+    def resume(cls, run_id: str, **kwargs) -> "ContentPipelineFlow":
+        """
+        Build a flow from the last checkpoint of `run_id`. Calling kickoff()
+        on it continues the run: finished research and drafts are reused and
+        the flow picks up from the last completed step.
+        """
+        store = get_checkpoint_store()
+        checkpoint = store.load(run_id) if store is not None else None
+        if checkpoint is None:
+            raise ValueError(f"No checkpoint found for run '{run_id}'.")
+
+        flow = cls(**kwargs)
+        state = ContentPipelineState.model_validate(checkpoint["state"])
+        for field in ContentPipelineState.model_fields:
+            setattr(flow.state, field, getattr(state, field))
+        flow.state.id = run_id
+        flow.trace.run_id = run_id
+        print(f"⏯️ Resuming run {run_id} after step '{checkpoint['step']}'")
+        return flow
+
+    async def kickoff_async(self, *args, **kwargs):
+        # kickoff() runs this on a fresh event loop, so both entry points are traced
+        error = None
+        try:
+            return await super().kickoff_async(*args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            finish_trace(self.trace, error)
+            if self._checkpoints is not None:
+                status = "failed" if error is not None else "finished"
+                await asyncio.to_thread(self._checkpoints.set_status, self.flow_id, status)
+
+    async def _checkpoint(self, step: str):
+        """Save the state after a completed step so the run can be resumed from here."""
+        if self._checkpoints is None:
+            return
+        async with self._checkpoint_lock:
+            with self._state_lock:
+                state = self.state.model_dump_json()
+            # SQLite commits block, so they run off the event loop
+            await asyncio.to_thread(self._checkpoints.save, self.flow_id, step, state)
+
+    def _emit(self, step: str, **data):
+        """Report flow progress (research, generate, score, regenerate, finalize) to the `on_step` callback."""
+        if self.on_step is not None:
+            self.on_step(step, data)
+
+    @property
+    def streaming(self) -> bool:
+        """True when partial output should be streamed to `on_step`; best-of-N candidates are not streamed."""
+        return self.state.stream and self.on_step is not None and self.state.num_candidates <= 1
+
+    @property
+    def fan_out(self) -> bool:
+        """True when several content types are produced from a single research pass."""
+        return len(self.state.content_types) > 1
+
+    async def _call_llm(self, llm: LLM, prompt: str):
+        content_type = CONTENT_TYPE_OF.get(llm.response_format)
+        if self.streaming and content_type is not None:
+            return await asyncio.to_thread(
+                stream_structured,
+                llm.model,
+                [{"role": "user", "content": prompt}],
+                llm.response_format,
+                lambda partial: self._emit("draft", content_type=content_type, content=partial),
+            )
+
+        async with allm_slot():
+            result = await llm.acall(prompt)
+        record_llm_text(llm.model, prompt, result.model_dump_json() if isinstance(result, BaseModel) else str(result))
+        return result
+
+    async def _kickoff(self, crew, inputs: dict | None = None, on_text: Callable[[str], None] | None = None):
+        """
+        Kick off a crew. With `on_text`, the crew streams its output and
+        `on_text` receives the text written so far as it arrives.
+        """
+        before = crew_usage(crew)
+        async with allm_slot():
+            if on_text is None:
+                result = await crew.akickoff(inputs=inputs)
+            else:
+                result = await self._kickoff_streaming(crew, inputs, on_text)
+        record_crew_usage(getattr(result, "token_usage", None), before=before)
+        return result
+
+    async def _kickoff_streaming(self, crew, inputs: dict | None, on_text: Callable[[str], None]):
+        # Pooled crews serve one flow at a time, so streaming is switched on just for this kickoff
+        crew.stream = True
+        try:
+            streaming = await crew.akickoff(inputs=inputs)
+            text = ""
+            async for chunk in streaming:
+                if getattr(chunk, "tool_call", None) is None:
+                    text += chunk.content
+                    on_text(text)
+            return streaming.result
+        finally:
+            crew.stream = False
+
+    def _stream_reasoning(self, content_type: str) -> Callable[[str], None] | None:
+        """An on_text callback emitting an audit's score and reason as `reasoning` events, when streaming."""
+        if not self.streaming:
+            return None
+        last = {"fields": {}, "at": 0.0}
+
+        def on_text(text: str):
+            fields = partial_score(text)
+            now = time.monotonic()
+            if fields and fields != last["fields"] and now - last["at"] >= PARTIAL_INTERVAL:
+                last.update(fields=fields, at=now)
+                self._emit("reasoning", content_type=content_type, **fields)
+
+        return on_text
+
     @start()
-    def init_content_pipeline(self):
+    async def init_content_pipeline(self):
+        # Keep the order stable and drop duplicates, before deciding whether to fan out
+        self.state.content_types = list(dict.fromkeys(self.state.content_types))
+        if len(self.state.content_types) == 1 and not self.state.content_type:
+            self.state.content_type = self.state.content_types[0]
 
-        if self.state.content_type not in ["blog_post", "tweet", "linkedin_post"]:
-            raise ValueError("Invalid content type. Must be 'blog_post', 'tweet', or 'linkedin_post'.")
+        content_types = self.state.content_types if self.fan_out else [self.state.content_type]
+        for content_type in content_types:
+            if content_type not in CONTENT_TYPES:
+                raise ValueError("Invalid content type. Must be 'blog_post', 'tweet', or 'linkedin_post'.")
 
         if self.state.topic == "":
             raise ValueError("The topic cannot be empty.")
 
-        if self.state.content_type == "tweet":
-            self.state.max_length = 100
-        elif self.state.content_type == "linkedin_post":
-            self.state.max_length = 500
-        elif self.state.content_type == "blog_post":
-            self.state.max_length = 800
+        if self.state.research_mode not in RESEARCH_MODES:
+            raise ValueError("Invalid research mode. Must be 'crew' or 'parallel'.")
 
-    @listen(init_content_pipeline)
-    def conduct_research(self):
+        if not self.fan_out:
+            self.state.max_length = MAX_LENGTHS[self.state.content_type]
 
-        result = (
-            ResearchCrew(topic=self.state.topic)
-            .crew()
-            .kickoff(
-            )
-        )
+        # Create per-type entries up front so concurrent branches never resize
+        # these dicts while a checkpoint is serializing them
+        for content_type in content_types:
+            self.state.iterations.setdefault(content_type, 0)
+            self.state.score_history.setdefault(content_type, [])
 
-        self.state.research = result["research"]
+        self.trace.topic = self.state.topic
+        self.trace.content_types = content_types
 
-    @router(conduct_research)
-    def conduct_research_router(self):
+    @listen(init_content_pipeline)
+    @traced()
+    async def conduct_research(self):
+        if self.state.research:
+            print("♻️ Using checkpointed research...")
+            self._emit("research", cached=True)
+            return
+
+        cache = get_cache("research")
+        key = normalize_topic(self.state.topic)
+
+        research = cache.get(key)
+        if research is not None:
+            print("♻️ Using cached research...")
+            self.state.research = research
+            if topic_index is not None:
+                topic_index.add(key, self.state.topic)
+            self._emit("research", cached=True)
+            await self._checkpoint("conduct_research")
+            return
+
+        # Reuse research done for a near-duplicate topic
+        match = topic_index.nearest(self.state.topic) if topic_index is not None else None
+        if match is not None:
+            similar_key, similarity = match
+            research = cache.get(similar_key)
+            if research is not None:
+                print(f"♻️ Using cached research for similar topic '{similar_key}' ({similarity:.2f})...")
+                self.state.research = research
+                self._emit("research", cached=True, similar_topic=similar_key)
+                await self._checkpoint("conduct_research")
+                return
+            topic_index.remove(similar_key)
+
+        self._emit("research", cached=False)
+
+        research = await self._parallel_research() if self.state.research_mode == "parallel" else None
+        if research is None:
+            crew = build_crew("research", _research_crew, self.state.topic)
+            research = (await self._kickoff(crew))["research"]
+
+        self.state.research = research
+        cache.set(key, self.state.research)
+        if topic_index is not None:
+            topic_index.add(key, self.state.topic)
+        await self._checkpoint("conduct_research")
+
+    async def _parallel_research(self) -> str | None:
+        """
+        Plan search queries, run them concurrently and write one report from
+        their merged, deduplicated results. None when no search succeeded.
+        """
+        topic = self.state.topic
+        plan = await self._call_llm(get_llm(MODEL, SearchPlan), plan_prompt(topic))
+        queries = plan_queries(topic, plan)
+
+        print(f"🔎 Researching {len(queries)} queries in parallel...")
+        results = await asyncio.gather(
+            *(asearch(query, limit=RESULTS_PER_QUERY) for query in queries),
+            return_exceptions=True,
+        )
+        corpus = build_corpus([result for result in results if not isinstance(result, BaseException)])
+        if not corpus:
+            print("⚠️ Parallel research found nothing, falling back to the Research Crew...")
+            return None
+
+        return await self._call_llm(get_llm(MODEL), synthesis_prompt(topic, corpus))
+
+    @listen(conduct_research)
+    @traced()
+    async def distill_research(self):
+        if self.state.key_facts or not self.state.distill or not needs_distilling(self.state.research):
+            return
+
+        cache = get_cache("distill")
+        key = distill_key(self.state.research, MODEL)
+
+        facts = cache.get(key)
+        if facts is None:
+            print("🧪 Distilling research into key facts...")
+            result = await self._call_llm(get_llm(MODEL, KeyFacts), distill_prompt(self.state.topic, self.state.research))
+            facts = [fact.strip() for fact in result.facts if fact.strip()]
+            cache.set(key, facts)
+
+        self.state.key_facts = facts
+        await self._checkpoint("distill_research")
+
+    def _research_for(self, content_type: str) -> str:
+        """The key facts sized for `content_type`, or the full report when it wasn't distilled."""
+        if self.state.key_facts:
+            return digest_for(content_type, self.state.key_facts)
+        return self.state.research
+
+    @router(distill_research)
+    async def conduct_research_router(self):
         content_type = self.state.content_type
 
+        if self.fan_out:
+            return "generate_all"
+
+        # Resuming a run that already has a draft: go straight to scoring it,
+        # or to the score router when that draft was already scored
+        if getattr(self.state, content_type) is not None:
+            if self._is_scored(content_type):
+                return "score_ready"
+            return f"{content_type}_ready"
+
         if content_type == "blog_post":
             return "generate_blog_post"
         elif content_type == "tweet":
@@ -84,43 +422,62 @@ class ContentPipelineFlow(Flow[ContentPipelineState]):
         elif content_type == "linkedin_post":
             return "generate_linkedin_post"
 
-    @listen("generate_blog_post")
-    def handle_generate_blog_post(self):
-        self._generate_blog_post()
+    @router("generate_blog_post")
+    async def handle_generate_blog_post(self):
+        self._emit("generate", content_type="blog_post")
+        await self._generate_blog_post()
+        await self._checkpoint("generate_blog_post")
         return "blog_post_ready"
 
-    @listen("regenerate_blog_post")
-    def handle_regenerate_blog_post(self):
-        self._generate_blog_post()
+    @router("regenerate_blog_post")
+    async def handle_regenerate_blog_post(self):
+        self._emit("regenerate", content_type="blog_post")
+        await self._generate_blog_post()
+        await self._checkpoint("generate_blog_post")
         return "blog_post_ready"
 
-    def _generate_blog_post(self):
+    @traced("blog_post")
+    async def _generate_blog_post(self):
         blog_post = self.state.blog_post
+        self.state.iterations["blog_post"] = self.state.iterations.get("blog_post", 0) + 1
 
         if blog_post is None:
             print("Generating new blog post...")
         else:
             print("Regenerating blog post (improving quality)...")
 
-        llm = LLM(model="gpt-5-nano", response_format=BlogPost)
+        self.state.blog_post = await self._best_of("blog_post", self._draft_blog_post)
+
+    async def _draft_blog_post(self) -> BlogPost:
+        blog_post = self.state.blog_post
+
+        score = self.state.scores.get("blog_post")
+        if blog_post is not None and score is not None and self.state.section_regeneration:
+            revised = await self._revise_blog_post(blog_post, score.feedback)
+            if revised is not None:
+                return revised
+
+        llm = get_llm(MODEL, BlogPost)
 
         if blog_post is None:
-            result = llm.call(
+            result = await self._call_llm(
+                llm,
                 f"""
                 Using the following research, create a blog post on the topic {self.state.topic}. The blog post should be well-structured and include a title, subtitle, and several sections that cover different aspects of the topic. The content should be concise and directly related to the research provided. Ensure that the blog post is engaging and informative, making use of the key insights and information gathered during the research phase.
                 
                 <research>
-                {self.state.research}
+                {self._research_for("blog_post")}
                 </research>
                 """,
             )
         else:
-            result = llm.call(
+            result = await self._call_llm(
+                llm,
                 f"""
                 The following is a blog post that was generated based on research on the topic {self.state.topic}. The blog post includes a title, subtitle, and several sections that cover different aspects of the topic. However, it may not be perfect and may require improvements to better capture the key insights from the research and to be more engaging and informative. Please review the blog post and make necessary improvements to enhance its quality, ensuring that it is concise, directly related to the research provided, and effectively communicates the key insights in an engaging manner.
                 
                 <research>
-                {self.state.research}
+                {self._research_for("blog_post")}
                 </research>
 
                 <blog_post>
@@ -128,44 +485,114 @@ class ContentPipelineFlow(Flow[ContentPipelineState]):
                 </blog_post>
                 """,
             )
-        self.state.blog_post = result
+        return result
+
+    async def _revise_blog_post(self, blog_post: BlogPost, feedback: List[SectionFeedback]) -> BlogPost | None:
+        """
+        Rewrite only the parts of `blog_post` the SEO audit flagged, all at
+        once, and merge them back into the post. None when no feedback points
+        at an existing part, so the caller rewrites the whole post instead.
+        """
+        notes: dict[tuple[str, int], list[str]] = {}
+        for item in feedback:
+            part = item.part.strip().lower()
+            if part in ("title", "subtitle"):
+                notes.setdefault((part, 0), []).append(item.feedback)
+            elif part == "section" and 1 <= item.section <= len(blog_post.sections):
+                notes.setdefault(("section", item.section), []).append(item.feedback)
+        if not notes:
+            return None
+
+        print(f"✂️ Rewriting {len(notes)} flagged part(s) of the blog post...")
+        llm = get_llm(MODEL, SectionRewrite)
+        rewrites = await asyncio.gather(
+            *(
+                self._call_llm(llm, self._section_prompt(blog_post, part, section, comments))
+                for (part, section), comments in notes.items()
+            )
+        )
+
+        sections = list(blog_post.sections)
+        update = {}
+        for (part, section), rewrite in zip(notes, rewrites):
+            if part == "section":
+                sections[section - 1] = rewrite.text
+            else:
+                update[part] = rewrite.text
+        revised = blog_post.model_copy(update={**update, "sections": sections})
+
+        if self.streaming:
+            self._emit("draft", content_type="blog_post", content=revised.model_dump())
+        return revised
+
+    def _section_prompt(self, blog_post: BlogPost, part: str, section: int, comments: List[str]) -> str:
+        label = f"section {section}" if part == "section" else part
+        feedback = "\n".join(f"- {comment}" for comment in comments)
+        return f"""
+                The following is a blog post that was generated based on research on the topic {self.state.topic}. An SEO specialist reviewed it and flagged its {label}. Rewrite only the {label} to address the feedback below, keeping it consistent in tone and length with the rest of the blog post and directly related to the research provided. Return only the rewritten {label}.
+
+                <research>
+                {self._research_for("blog_post")}
+                </research>
+
+                <blog_post>
+                {blog_post.model_dump_json()}
+                </blog_post>
+
+                <feedback>
+                {feedback}
+                </feedback>
+                """
 
-    @listen("generate_tweet")
-    def handle_generate_tweet(self):
-        self._generate_tweet()
+    @router("generate_tweet")
+    async def handle_generate_tweet(self):
+        self._emit("generate", content_type="tweet")
+        await self._generate_tweet()
+        await self._checkpoint("generate_tweet")
         return "tweet_ready"
 
-    @listen("regenerate_tweet")
-    def handle_regenerate_tweet(self):
-        self._generate_tweet()
+    @router("regenerate_tweet")
+    async def handle_regenerate_tweet(self):
+        self._emit("regenerate", content_type="tweet")
+        await self._generate_tweet()
+        await self._checkpoint("generate_tweet")
         return "tweet_ready"
 
-    def _generate_tweet(self):
+    @traced("tweet")
+    async def _generate_tweet(self):
         tweet = self.state.tweet
+        self.state.iterations["tweet"] = self.state.iterations.get("tweet", 0) + 1
 
         if tweet is None:
             print("Generating new tweet...")
         else:
             print("Regenerating tweet (improving quality)...")
 
-        llm = LLM(model="gpt-5-nano", response_format=Tweet)
+        self.state.tweet = await self._best_of("tweet", self._draft_tweet)
+
+    async def _draft_tweet(self) -> Tweet:
+        tweet = self.state.tweet
+
+        llm = get_llm(MODEL, Tweet)
         if tweet is None:
-            result = llm.call(
+            result = await self._call_llm(
+                llm,
                 f"""
                 Using the following research, create a tweet on the topic {self.state.topic}. The tweet should be concise and engaging, capturing the essence of the topic in a way that resonates with the audience. It should include relevant hashtags to increase visibility and engagement. Ensure that the content is directly related to the research provided and effectively communicates the key insights in a compelling manner.
                 
                 <research>
-                {self.state.research}
+                {self._research_for("tweet")}
                 </research>
                 """,
             )
         else:
-            result = llm.call(
+            result = await self._call_llm(
+                llm,
                 f"""
                 The following is a tweet that was generated based on research on the topic {self.state.topic}. The tweet is concise and engaging, capturing the essence of the topic in a way that resonates with the audience. It includes relevant hashtags to increase visibility and engagement. However, it may not be perfect and may require improvements to better capture the key insights from the research and to be more compelling. Please review the tweet and make necessary improvements to enhance its quality, ensuring that it is concise, directly related to the research provided, and effectively communicates the key insights in a compelling manner.
                 
                 <research>
-                {self.state.research}
+                {self._research_for("tweet")}
                 </research>
 
                 <tweet>
@@ -173,45 +600,58 @@ class ContentPipelineFlow(Flow[ContentPipelineState]):
                 </tweet>
                 """,
             )
-        self.state.tweet = result
+        return result
 
-    @listen("generate_linkedin_post")
-    def handle_generate_linkedin_post(self):
-        self._generate_linkedin_post()
+    @router("generate_linkedin_post")
+    async def handle_generate_linkedin_post(self):
+        self._emit("generate", content_type="linkedin_post")
+        await self._generate_linkedin_post()
+        await self._checkpoint("generate_linkedin_post")
         return "linkedin_post_ready"
 
-    @listen("regenerate_linkedin_post")
-    def handle_regenerate_linkedin_post(self):
-        self._generate_linkedin_post()
+    @router("regenerate_linkedin_post")
+    async def handle_regenerate_linkedin_post(self):
+        self._emit("regenerate", content_type="linkedin_post")
+        await self._generate_linkedin_post()
+        await self._checkpoint("generate_linkedin_post")
         return "linkedin_post_ready"
 
-    def _generate_linkedin_post(self):
+    @traced("linkedin_post")
+    async def _generate_linkedin_post(self):
         linkedin_post = self.state.linkedin_post
+        self.state.iterations["linkedin_post"] = self.state.iterations.get("linkedin_post", 0) + 1
 
         if linkedin_post is None:
             print("Generating new LinkedIn post...")
         else:
             print("Regenerating LinkedIn post (improving quality)...")
 
-        llm = LLM(model="gpt-5-nano", response_format=LinkedInPost)
+        self.state.linkedin_post = await self._best_of("linkedin_post", self._draft_linkedin_post)
+
+    async def _draft_linkedin_post(self) -> LinkedInPost:
+        linkedin_post = self.state.linkedin_post
+
+        llm = get_llm(MODEL, LinkedInPost)
 
         if linkedin_post is None:
-            result = llm.call(
+            result = await self._call_llm(
+                llm,
                 f"""
                 Using the following research, create a LinkedIn post on the topic {self.state.topic}. The LinkedIn post should include a compelling hook to grab the reader's attention, followed by informative content that provides value to the audience. It should conclude with a strong call to action that encourages engagement, such as asking readers to share their thoughts or visit a website for more information. Ensure that the content is directly related to the research provided and effectively communicates the key insights in a professional and engaging manner.
                 
                 <research>
-                {self.state.research}
+                {self._research_for("linkedin_post")}
                 </research>
                 """,
             )
         else:
-            result = llm.call(
+            result = await self._call_llm(
+                llm,
                 f"""
                 The following is a LinkedIn post that was generated based on research on the topic {self.state.topic}. The LinkedIn post includes a compelling hook to grab the reader's attention, followed by informative content that provides value to the audience. It concludes with a strong call to action that encourages engagement, such as asking readers to share their thoughts or visit a website for more information. However, it may not be perfect and may require improvements to better capture the key insights from the research and to be more professional and engaging. Please review the LinkedIn post and make necessary improvements to enhance its quality, ensuring that it is directly related to the research provided and effectively communicates the key insights in a professional and engaging manner.
                 
                 <research>
-                {self.state.research}
+                {self._research_for("linkedin_post")}
                 </research>
 
                 <linkedin_post>
@@ -219,56 +659,172 @@ class ContentPipelineFlow(Flow[ContentPipelineState]):
                 </linkedin_post>
                 """,
             )
-        self.state.linkedin_post = result
+        return result
+
+    async def _best_of(self, content_type: str, draft: Callable):
+        """
+        Return the next draft. With num_candidates > 1, draft that many
+        candidates concurrently, score them concurrently and keep the best;
+        its score is reused by the following check step.
+        """
+        n = self.state.num_candidates
+        if n <= 1:
+            return await draft()
+
+        print(f"✍️ Drafting {n} candidates...")
+        # Each task runs in a copy of the current context, so all of them report to the current trace step
+        candidates = await asyncio.gather(*(draft() for _ in range(n)))
+        scores = await asyncio.gather(*(self._score_candidate(content_type, candidate) for candidate in candidates))
+
+        best = max(range(n), key=lambda i: scores[i].score)
+        print(f"🏆 Best of {n} candidates - Score: {scores[best].score}/10")
+        self._pending_scores[content_type] = scores[best]
+        return candidates[best]
+
+    async def _score_candidate(self, content_type: str, candidate) -> Score:
+        if self.state.prescore:
+            score = self._prescore(content_type, candidate)
+            if score is not None:
+                return score
 
-    @listen("blog_post_ready")
-    def check_seo(self):
-        print("Running SEO check...")
-        result = (
-            SeoCrew()
-            .crew()
-            .kickoff(
-                inputs={
-                    "blog_post": self.state.blog_post.model_dump_json(),
-                    "topic": self.state.topic,
-                }
-            )
+        if content_type == "blog_post":
+            return await self._check_seo(candidate)
+        return await self._check_virality(content_type, candidate)
+
+    @traced()
+    def _prescore(self, content_type: str, candidate) -> Score | None:
+        """
+        Return a zero Score for drafts the local heuristics reject, None to
+        escalate to the crews. A rejected draft never beats an audited one.
+        """
+        result = prescore(
+            content_type,
+            candidate,
+            self.state.topic,
+            self.state.max_length or MAX_LENGTHS[content_type],
         )
-        self.state.score = result.pydantic
-        print(f"📊 SEO Check Complete - Score: {self.state.score.score}/10")
+        if not result.rejected:
+            return None
+
+        score = Score(score=0, reason="Pre-check failed: " + "; ".join(result.reasons) + ".")
+        print(f"⚡ Pre-check rejected draft - Score: {score.score}/10 ({score.reason})")
+        return score
+
+    async def _score(self, content_type: str) -> Score:
+        """Score the current draft, unless best-of-N already scored it."""
+        score = self._pending_scores.pop(content_type, None)
+        if score is not None:
+            return score
+        return await self._score_candidate(content_type, getattr(self.state, content_type))
+
+    @router("blog_post_ready")
+    async def check_seo(self):
+        self.state.score = self._record_score("blog_post", await self._score("blog_post"))
+        self._emit("score", score=self.state.score.score, reason=self.state.score.reason)
+        await self._checkpoint("check_seo")
         return "score_ready"
 
-    @listen(or_("tweet_ready", "linkedin_post_ready"))
-    def check_virality(self):
-        print("🚀 Running virality check...")
-        result = (
-            ViralityCrew()
-            .crew()
-            .kickoff(
-                inputs={
-                    "content_type": self.state.content_type,
-                    "content": self.state.tweet.model_dump_json() if self.state.content_type == "tweet" else self.state.linkedin_post.model_dump_json(),
-                    "topic": self.state.topic,
-                }
-            )
-        )
-        self.state.score = result.pydantic
-        print(f"📊 Virality Check Complete - Score: {self.state.score.score}/10")
+    @traced("blog_post")
+    async def _check_seo(self, blog_post: BlogPost) -> Score:
+        print("Running SEO check...")
+        inputs = {
+            "blog_post": blog_post.model_dump_json(),
+            "topic": self.state.topic,
+        }
+        with crew_pool("seo", _seo_crew).acquire() as crew:
+            score = (await self._kickoff(crew, inputs=inputs, on_text=self._stream_reasoning("blog_post"))).pydantic
+        print(f"📊 SEO Check Complete - Score: {score.score}/10")
+        return Score.model_validate(score.model_dump())
+
+    @router(or_("tweet_ready", "linkedin_post_ready"))
+    async def check_virality(self):
+        self.state.score = self._record_score(self.state.content_type, await self._score(self.state.content_type))
+        self._emit("score", score=self.state.score.score, reason=self.state.score.reason)
+        await self._checkpoint("check_virality")
         return "score_ready"
 
+    @traced()
+    async def _check_virality(self, content_type: str, content: Tweet | LinkedInPost) -> Score:
+        print("🚀 Running virality check...")
+        inputs = {
+            "content_type": content_type,
+            "content": content.model_dump_json(),
+            "topic": self.state.topic,
+        }
+        with crew_pool("virality", _virality_crew).acquire() as crew:
+            score = (await self._kickoff(crew, inputs=inputs, on_text=self._stream_reasoning(content_type))).pydantic
+        print(f"📊 Virality Check Complete - Score: {score.score}/10")
+        return score
+
+    def _record_score(self, content_type: str, score: Score) -> Score:
+        """Track the score history and keep the highest-scoring candidate seen so far."""
+        with self._state_lock:
+            self.state.scores[content_type] = score
+            self.state.score_history.setdefault(content_type, []).append(score.score)
+
+            best = self.state.best_scores.get(content_type)
+            if best is None or score.score > best.score:
+                self.state.best_scores[content_type] = score
+                self.state.best_content[content_type] = getattr(self.state, content_type)
+
+        return score
+
+    def _is_scored(self, content_type: str) -> bool:
+        """True when the current draft of `content_type` already has a score."""
+        return len(self.state.score_history.get(content_type, [])) >= self.state.iterations.get(content_type, 0)
+
+    def _stop_reason(self, content_type: str) -> str | None:
+        """Why the regeneration loop for `content_type` should stop despite a failing score, if it should."""
+        state = self.state
+
+        if state.max_iterations and state.iterations.get(content_type, 0) >= state.max_iterations:
+            return f"reached {state.max_iterations} iterations"
+
+        if state.time_budget and time.time() - self.trace.started_at >= state.time_budget:
+            return f"exceeded {state.time_budget:g}s time budget"
+
+        if state.cost_budget and self.trace.totals()["cost"] >= state.cost_budget:
+            return f"exceeded ${state.cost_budget:g} cost budget"
+
+        history = state.score_history.get(content_type, [])
+        patience = state.plateau_patience
+        if patience and len(history) > patience and max(history[-patience:]) <= max(history[:-patience]):
+            return f"score plateaued for {patience} rounds"
+
+        return None
+
+    def _use_best(self, content_type: str):
+        """Replace the latest draft with the highest-scoring candidate seen so far."""
+        best = self.state.best_content.get(content_type)
+        if best is None:
+            return
+        setattr(self.state, content_type, best)
+        self.state.scores[content_type] = self.state.best_scores[content_type]
+        if content_type == self.state.content_type:
+            self.state.score = self.state.best_scores[content_type]
+
     @router("score_ready")
-    def score_router(self):
+    @traced()
+    async def score_router(self):
         content_type = self.state.content_type
         score = self.state.score
 
         print(f"🔍 Score Router - Content Type: {content_type}, Score: {score.score}/10")
 
-        if score.score >= 7:
-            print("✅ Score passed threshold (>= 7), proceeding to finalize")
+        if score.score >= SCORE_THRESHOLD:
+            print(f"✅ Score passed threshold (>= {SCORE_THRESHOLD}), proceeding to finalize")
+            return "check_passed"
+
+        stop_reason = self._stop_reason(content_type)
+        if stop_reason is not None:
+            self.state.stop_reasons[content_type] = stop_reason
+            self._use_best(content_type)
+            await self._checkpoint("score_router")
+            print(f"⏹️ Stopping regeneration ({stop_reason}), finalizing best score {self.state.score.score}/10")
             return "check_passed"
 
         # Score is below threshold, regenerate
-        print(f"🔄 Score below threshold ({score.score} < 7), regenerating {content_type}")
+        print(f"🔄 Score below threshold ({score.score} < {SCORE_THRESHOLD}), regenerating {content_type}")
 
         if content_type == "blog_post":
             return "regenerate_blog_post"
@@ -278,7 +834,7 @@ class ContentPipelineFlow(Flow[ContentPipelineState]):
             return "regenerate_linkedin_post"
 
     @listen("check_passed")
-    def finalize_content(self):
+    async def finalize_content(self):
         """Content has passed the quality check and is finalized."""
         print("Finalizing Content!!!")
 
@@ -293,6 +849,7 @@ class ContentPipelineFlow(Flow[ContentPipelineState]):
             print(f"🚀 Virality Score: {self.state.score.score}/10")
 
         print("✅ Content ready for publication!")
+        self._emit("finalize", content_type=self.state.content_type)
         return (
             self.state.linkedin_post
             if self.state.content_type == "linkedin_post"
@@ -302,8 +859,58 @@ class ContentPipelineFlow(Flow[ContentPipelineState]):
                 else self.state.blog_post
             ))
 
+    @listen("generate_all")
+    async def handle_generate_all(self):
+        """Fan-out mode: run every requested content type's generate/score loop concurrently."""
+        content_types = self.state.content_types
+
+        await asyncio.gather(*(self._run_branch(content_type) for content_type in content_types))
+
+        print("✅ All content ready for publication!")
+        self._emit("finalize", content_types=content_types)
+        return {content_type: getattr(self.state, content_type) for content_type in content_types}
+
+    async def _run_branch(self, content_type: str):
+        generate = {
+            "blog_post": self._generate_blog_post,
+            "tweet": self._generate_tweet,
+            "linkedin_post": self._generate_linkedin_post,
+        }[content_type]
+
+        # A resumed run may already have a (scored) draft for this branch
+        if getattr(self.state, content_type) is None:
+            self._emit("generate", content_type=content_type)
+            await generate()
+            await self._checkpoint(f"generate_{content_type}")
+
+        while True:
+            if self._is_scored(content_type):
+                score = self.state.scores[content_type]
+            else:
+                score = self._record_score(content_type, await self._score(content_type))
+                self._emit("score", content_type=content_type, score=score.score, reason=score.reason)
+                await self._checkpoint(f"score_{content_type}")
+
+            if score.score >= SCORE_THRESHOLD or content_type in self.state.stop_reasons:
+                return
+
+            stop_reason = self._stop_reason(content_type)
+            if stop_reason is not None:
+                with self._state_lock:
+                    self.state.stop_reasons[content_type] = stop_reason
+                    self._use_best(content_type)
+                await self._checkpoint(f"score_{content_type}")
+                print(f"⏹️ Stopping {content_type} regeneration ({stop_reason})")
+                return
+
+            print(f"🔄 {content_type} score below threshold ({score.score} < {SCORE_THRESHOLD}), regenerating")
+            self._emit("regenerate", content_type=content_type)
+            await generate()
+            await self._checkpoint(f"generate_{content_type}")
+
 
 if __name__ == "__main__":
+    configure_trace_log()
     flow = ContentPipelineFlow()
     flow.kickoff(inputs={"content_type": "tweet", "topic": "The Future of AI in Content Creation"})
     flow.plot("content_pipeline_flow.html")
@@ -0,0 +1,128 @@
+"""
+Deterministic, pure-Python checks run on a draft before the LLM audits.
+
+Drafts that are clearly failing (far too long or short, missing hashtags, a
+call to action or sections, unrelated to the topic) are rejected here so the
+flow can regenerate without paying for an SEO or virality crew run.
+"""
+import re
+from typing import List
+
+from pydantic import BaseModel
+
+from constants import STOPWORDS
+
+
+_WORD = re.compile(r"[A-Za-z0-9']+")
+_SENTENCE_END = re.compile(r"[.!?]+")
+_VOWEL_GROUP = re.compile(r"[aeiouy]+")
+_HASHTAG = re.compile(r"#\w+")
+
+TWEET_MAX_CHARS = 280
+MIN_WORDS = {"tweet": 5, "linkedin_post": 40, "blog_post": 200}
+MIN_BLOG_SECTIONS = 3
+# Drafts longer than max_length * LENGTH_SLACK words are rejected outright
+LENGTH_SLACK = 1.5
+
+
+class PreScore(BaseModel):
+    score: int
+    rejected: bool
+    reasons: List[str] = []
+    words: int = 0
+    keyword_coverage: float = 0.0
+    reading_ease: float = 0.0
+
+
+def words_of(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def count_syllables(word: str) -> int:
+    word = word.lower().rstrip("e") or word.lower()
+    return max(1, len(_VOWEL_GROUP.findall(word)))
+
+
+def reading_ease(text: str) -> float:
+    """Flesch reading ease; higher is easier to read (60-70 is plain English)."""
+    words = words_of(text)
+    if not words:
+        return 0.0
+    sentences = max(1, len([s for s in _SENTENCE_END.split(text) if s.strip()]))
+    syllables = sum(count_syllables(word) for word in words)
+    return 206.835 - 1.015 * (len(words) / sentences) - 84.6 * (syllables / len(words))
+
+
+def keyword_coverage(text: str, topic: str) -> float:
+    """Fraction of the topic's keywords that appear in the text."""
+    keywords = {word for word in words_of(topic) if word not in STOPWORDS}
+    if not keywords:
+        return 1.0
+    present = set(words_of(text))
+    return len(keywords & present) / len(keywords)
+
+
+def _text_of(content_type: str, content) -> str:
+    if content_type == "blog_post":
+        return "\n".join([content.title, content.subtitle, *content.sections])
+    if content_type == "tweet":
+        return f"{content.content} {content.hashtags}"
+    return "\n".join([content.hook, content.content, content.call_to_action])
+
+
+def prescore(content_type: str, content, topic: str, max_length: int) -> PreScore:
+    """
+    Score a draft from 0-10 with cheap heuristics. `rejected` is set when the
+    draft has a hard failure that an LLM audit could only confirm.
+    `max_length` is in words, as in ContentPipelineState.
+    """
+    text = _text_of(content_type, content)
+    words = words_of(text)
+    coverage = keyword_coverage(text, topic)
+    ease = reading_ease(text)
+
+    failures = []
+    warnings = []
+
+    if max_length and len(words) > max_length * LENGTH_SLACK:
+        failures.append(f"{len(words)} words is far over the {max_length} word limit")
+    elif max_length and len(words) > max_length:
+        warnings.append(f"{len(words)} words is over the {max_length} word limit")
+
+    if len(words) < MIN_WORDS[content_type]:
+        failures.append(f"only {len(words)} words")
+
+    if coverage == 0:
+        failures.append("never mentions the topic's keywords")
+    elif coverage < 0.5:
+        warnings.append(f"mentions only {coverage:.0%} of the topic's keywords")
+
+    if content_type == "blog_post":
+        if not content.title.strip():
+            failures.append("missing a title")
+        if len([section for section in content.sections if section.strip()]) < MIN_BLOG_SECTIONS:
+            failures.append(f"fewer than {MIN_BLOG_SECTIONS} sections")
+    elif content_type == "tweet":
+        if len(text) > TWEET_MAX_CHARS:
+            failures.append(f"{len(text)} characters is over the {TWEET_MAX_CHARS} character tweet limit")
+        if not _HASHTAG.search(content.hashtags or content.content):
+            failures.append("no hashtags")
+    elif content_type == "linkedin_post":
+        if not content.hook.strip():
+            failures.append("missing a hook")
+        if len(words_of(content.call_to_action)) < 3:
+            failures.append("no real call to action")
+
+    if ease < 30:
+        warnings.append(f"hard to read (reading ease {ease:.0f})")
+
+    score = max(0, 10 - 4 * len(failures) - len(warnings))
+
+    return PreScore(
+        score=score,
+        rejected=bool(failures),
+        reasons=failures + warnings,
+        words=len(words),
+        keyword_coverage=coverage,
+        reading_ease=ease,
+    )
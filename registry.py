@@ -0,0 +1,133 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from crewai import LLM
+
+
+_llms: dict[tuple, "LLM"] = {}
+_llms_lock = threading.Lock()
+
+_pools: dict[str, "CrewPool"] = {}
+_pools_lock = threading.Lock()
+
+# Replacements for LLM(...) and for named crew factories, e.g. offline stand-ins
+_llm_factory: Callable | None = None
+_crew_factories: dict[str, Callable] = {}
+
+
+def set_llm_factory(factory: Callable | None):
+    """
+    Build LLMs with `factory(model=..., response_format=...)` instead of
+    crewai's LLM, or restore the default with None. Clears the shared LLMs.
+    """
+    global _llm_factory
+    with _llms_lock:
+        _llm_factory = factory
+        _llms.clear()
+
+
+def set_crew_factory(name: str, factory: Callable | None):
+    """
+    Build the crews called `name` with `factory` instead of the flow's own
+    factory, or restore it with None. Drops the pool of that name.
+    """
+    with _pools_lock:
+        if factory is None:
+            _crew_factories.pop(name, None)
+        else:
+            _crew_factories[name] = factory
+        _pools.pop(name, None)
+
+
+def _crewai_llm(**kwargs) -> "LLM":
+    # crewai takes seconds to import, so it is only loaded for the first LLM built
+    from crewai import LLM
+
+    return LLM(**kwargs)
+
+
+def get_llm(model: str, response_format=None) -> "LLM":
+    """
+    Return the process-wide LLM for (model, response_format), building it once.
+    LLM objects hold no per-call state, so one instance is shared by every flow.
+    """
+    key = (model, response_format)
+    with _llms_lock:
+        llm = _llms.get(key)
+        if llm is None:
+            llm = _llms[key] = (_llm_factory or _crewai_llm)(model=model, response_format=response_format)
+        return llm
+
+
+class CrewPool:
+    """
+    Pool of ready-built crews of one type.
+
+    A Crew rewrites its tasks with the inputs of the current kickoff, so an
+    instance can only serve one flow at a time; the pool hands each caller an
+    idle crew, building a new one only when all existing crews are busy.
+    """
+
+    def __init__(self, factory: Callable):
+        self.factory = factory
+        self.built = 0
+        self.reused = 0
+        self.build_seconds = 0.0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self):
+        with self._lock:
+            crew = self._idle.pop() if self._idle else None
+            if crew is not None:
+                self.reused += 1
+
+        if crew is None:
+            started = time.perf_counter()
+            crew = self.factory()
+            with self._lock:
+                self.built += 1
+                self.build_seconds += time.perf_counter() - started
+
+        try:
+            yield crew
+        finally:
+            with self._lock:
+                self._idle.append(crew)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "built": self.built,
+                "reused": self.reused,
+                "idle": len(self._idle),
+                "avg_build_seconds": self.build_seconds / self.built if self.built else 0.0,
+            }
+
+
+def crew_pool(name: str, factory: Callable) -> CrewPool:
+    """Return the process-wide pool called `name`, creating it with `factory` on first use."""
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = CrewPool(_crew_factories.get(name, factory))
+        return pool
+
+
+def build_crew(name: str, factory: Callable, *args, **kwargs):
+    """Build a single-use crew called `name`, such as a research crew bound to one topic."""
+    with _pools_lock:
+        factory = _crew_factories.get(name, factory)
+    return factory(*args, **kwargs)
+
+
+def registry_stats() -> dict:
+    with _llms_lock:
+        llms = [f"{model}:{getattr(response_format, '__name__', response_format)}" for model, response_format in _llms]
+    with _pools_lock:
+        pools = {name: pool.stats() for name, pool in _pools.items()}
+    return {"llms": llms, "crews": pools}
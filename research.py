@@ -0,0 +1,58 @@
+"""
+Parallel research: an alternative to the Research Crew's one-search-per-turn
+agent loop. One LLM call plans a set of search queries up front, the
+searches run concurrently, their results are merged without duplicates, and
+one more LLM call writes the report from the merged corpus.
+"""
+import os
+from typing import List
+
+from pydantic import BaseModel
+
+from cleaning import clean_results, merge_results
+
+
+# "crew" runs the Research Crew agent, "parallel" plans and runs searches concurrently
+RESEARCH_MODES = ("crew", "parallel")
+RESEARCH_MODE = os.getenv("RESEARCH_MODE", "crew")
+RESEARCH_QUERIES = int(os.getenv("RESEARCH_QUERIES", "4"))
+RESULTS_PER_QUERY = int(os.getenv("RESEARCH_RESULTS_PER_QUERY", "3"))
+CORPUS_MAX_CHARS = int(os.getenv("RESEARCH_CORPUS_MAX_CHARS", "16000"))
+RESULT_MAX_CHARS = int(os.getenv("SEARCH_RESULT_MAX_CHARS", "3000"))
+
+
+class SearchPlan(BaseModel):
+    queries: List[str]
+
+
+def plan_prompt(topic: str, count: int = RESEARCH_QUERIES) -> str:
+    return f"""
+    You are planning web research for content on the topic {topic}. Write {count} distinct web search queries that together cover recent developments, key statistics and expert opinions on the topic. Each query should target a different aspect, be specific enough to return focused results, and be at most 10 words long.
+    """
+
+
+def plan_queries(topic: str, plan: SearchPlan | None, count: int = RESEARCH_QUERIES) -> list[str]:
+    """The planned queries without blanks or repeats, falling back to the topic itself."""
+    queries = [] if plan is None else [" ".join(query.split()) for query in plan.queries]
+    queries = list(dict.fromkeys(query for query in queries if query))[:count]
+    return queries or [topic]
+
+
+def build_corpus(result_lists: list[list[dict]]) -> str:
+    """Merge the results of all queries into one deduplicated, size-bounded corpus."""
+    chunks = clean_results(
+        merge_results(result_lists),
+        max_chars_per_result=RESULT_MAX_CHARS,
+        max_total_chars=CORPUS_MAX_CHARS,
+    )
+    return "\n\n".join(f"## {chunk['title']}\n{chunk['url']}\n{chunk['markdown']}" for chunk in chunks)
+
+
+def synthesis_prompt(topic: str, corpus: str) -> str:
+    return f"""
+    Using the following web search results, write a research report on the topic {topic}. The report will be used to create high-quality content, so cover recent developments, key statistics and expert opinions. Keep it concise and directly related to the topic, and only use information found in the search results.
+
+    <search_results>
+    {corpus}
+    </search_results>
+    """
@@ -0,0 +1,116 @@
+"""
+Finished content cache for the web apps.
+
+A finished /generate response is stored under a key built from the
+normalized request, the models in use and a fingerprint of the prompts, so
+changing a prompt or a model never serves content made by the old one. The
+stored content is also served by GET /results/<key> with an ETag, and repeat
+requests that send it back in If-None-Match get an empty 304.
+"""
+import hashlib
+import json
+import os
+import time
+from functools import lru_cache
+
+from cache import NullCache, get_cache, normalize_topic
+from constants import MODEL
+from instrumentation import CREW_MODEL
+
+
+# Bump to invalidate cached content when generation changes outside the prompt modules
+PROMPT_VERSION = "1"
+
+# Source files whose prompts, models and settings shape the finished content
+PROMPT_FILES = ("constants.py", "main.py", "distill.py", "research.py", "research_crew.py", "seo_crew.py", "virality_crew.py")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@lru_cache(maxsize=1)
+def prompt_fingerprint() -> str:
+    """Hash of the prompt files, read from disk so that keying a request doesn't import crewai."""
+    digest = hashlib.sha1(PROMPT_VERSION.encode())
+    for name in PROMPT_FILES:
+        with open(os.path.join(BASE_DIR, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def result_key(inputs: dict) -> str:
+    """Cache key of a request's finished content: same topic and content types, models and prompts."""
+    content_types = inputs.get("content_types") or [inputs.get("content_type", "")]
+    request = {
+        "topic": normalize_topic(inputs.get("topic", "")),
+        "content_types": sorted(content_types),
+        "model": MODEL,
+        "crew_model": CREW_MODEL,
+        "prompts": prompt_fingerprint(),
+    }
+    return hashlib.sha1(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+def get_result(inputs: dict) -> dict | None:
+    """The cached entry (key, response, etag, expires_at) for a request, if there is one."""
+    return get_entry(result_key(inputs))
+
+
+def get_entry(key: str) -> dict | None:
+    entry = get_cache("results").get(key)
+    if entry is not None:
+        entry.setdefault("key", key)
+    return entry
+
+
+def store_result(inputs: dict, response: dict) -> dict:
+    """Cache a finished response. With the cache disabled, the entry has no ETag and is served as no-store."""
+    cache = get_cache("results")
+    key = result_key(inputs)
+    if isinstance(cache, NullCache):
+        return {"key": key, "response": response, "etag": None, "expires_at": None}
+
+    ttl = getattr(cache, "ttl", None)
+    entry = {
+        "key": key,
+        "response": response,
+        "etag": '"' + hashlib.sha1(json.dumps(response, sort_keys=True).encode()).hexdigest() + '"',
+        "expires_at": time.time() + ttl if ttl else None,
+    }
+    cache.set(key, entry)
+    return entry
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def cache_headers(entry: dict) -> dict:
+    """ETag and Cache-Control headers of cached content served by GET /results/<key>."""
+    if entry["etag"] is None:
+        return {"Cache-Control": "no-store"}
+    if entry["expires_at"] is None:
+        cache_control = "private, max-age=31536000"
+    else:
+        cache_control = f"private, max-age={max(0, int(entry['expires_at'] - time.time()))}"
+    return {"ETag": entry["etag"], "Cache-Control": cache_control}
+
+
+def generate_headers(entry: dict, hit: bool, location: str) -> dict:
+    """
+    Headers of a POST /generate response: X-Cache, and Content-Location
+    pointing at the GET resource of the content when it was cached.
+    """
+    headers = {"X-Cache": "HIT" if hit else "MISS"}
+    if entry["etag"] is None:
+        headers["Cache-Control"] = "no-store"
+    else:
+        headers["Content-Location"] = location
+    return headers
+
+
+def wants_fresh(data: dict, cache_control: str | None) -> bool:
+    """True when a request asks to regenerate: `"force": true` in the body or a no-cache request header."""
+    return bool(data.get("force")) or "no-cache" in (cache_control or "").lower()
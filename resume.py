@@ -0,0 +1,37 @@
+"""
+List and resume checkpointed content pipeline runs.
+
+    python resume.py list [--status running]
+    python resume.py <run_id>
+"""
+import argparse
+
+from checkpoints import get_checkpoint_store
+from instrumentation import configure_trace_log
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List and resume checkpointed content pipeline runs.")
+    parser.add_argument("run_id", help="run to resume, or 'list' to show recent runs")
+    parser.add_argument("--status", help="with 'list', only show runs with this status (running, failed, finished)")
+    args = parser.parse_args()
+
+    configure_trace_log()
+    store = get_checkpoint_store()
+    if store is None:
+        parser.error("Checkpointing is disabled (CHECKPOINTS=0).")
+
+    if args.run_id == "list":
+        for run in store.list(status=args.status):
+            print(f"{run['run_id']}  {run['status']:<8}  after {run['step']}")
+        return
+
+    # Imported here so listing runs doesn't wait for crewai to load
+    from main import ContentPipelineFlow
+
+    flow = ContentPipelineFlow.resume(args.run_id)
+    flow.kickoff()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import Future
+
+from cache import get_cache
+from instrumentation import record_search_call
+
+
+class SearchError(Exception):
+    pass
+
+
+_client = None
+_async_client = None
+# True once set_search_client() installed a client that asearch() must reuse
+_custom_client = False
+_client_lock = threading.Lock()
+
+_in_flight: dict[str, Future] = {}
+_in_flight_lock = threading.Lock()
+
+
+def get_search_client():
+    """Return the shared Firecrawl client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from firecrawl import FirecrawlApp
+
+            _client = FirecrawlApp(api_key=os.getenv("FIRECRAWL_API_KEY"))
+        return _client
+
+
+def set_search_client(client):
+    """
+    Replace the shared search client. Any object with a Firecrawl compatible
+    `search(query=..., limit=..., formats=...)` method returning a response with
+    `success` and `data` works, which makes it easy to substitute a local stub.
+    """
+    global _client, _async_client, _custom_client
+    with _client_lock:
+        _client = client
+        _async_client = None
+        _custom_client = client is not None
+
+
+def get_async_search_client():
+    """
+    Return the shared async Firecrawl client, creating it on first use. None
+    when a client was installed with set_search_client(), which asearch()
+    then calls from a worker thread.
+    """
+    global _async_client
+    with _client_lock:
+        if _async_client is None and not _custom_client:
+            from firecrawl import AsyncFirecrawlApp
+
+            _async_client = AsyncFirecrawlApp(api_key=os.getenv("FIRECRAWL_API_KEY"))
+        return _async_client
+
+
+def set_async_search_client(client):
+    """Replace the shared async client: any object with an awaitable Firecrawl compatible `search`."""
+    global _async_client
+    with _client_lock:
+        _async_client = client
+
+
+def _cache_key(query: str, limit: int, formats: list[str]) -> str:
+    return json.dumps([" ".join(query.split()), limit, sorted(formats)])
+
+
+def search(query: str, limit: int = 5, formats: list[str] | None = None) -> list[dict]:
+    """
+    Search the web through the shared client.
+
+    Results are cached per (query, limit, formats) and concurrent identical
+    queries are coalesced so that only one request is in flight at a time.
+    """
+    formats = list(formats or ["markdown"])
+    key = _cache_key(query, limit, formats)
+
+    cache = get_cache("search")
+    results = cache.get(key)
+    if results is not None:
+        return results
+
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _in_flight[key] = future
+
+    if not leader:
+        return future.result()
+
+    try:
+        results = _search(query, limit, formats)
+        cache.set(key, results)
+        future.set_result(results)
+        return results
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+
+async def asearch(query: str, limit: int = 5, formats: list[str] | None = None) -> list[dict]:
+    """
+    search() for coroutines. It shares the cache and the in-flight
+    coalescing with search(), so sync and async callers never duplicate a
+    request.
+    """
+    formats = list(formats or ["markdown"])
+    key = _cache_key(query, limit, formats)
+
+    cache = get_cache("search")
+    results = cache.get(key)
+    if results is not None:
+        return results
+
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _in_flight[key] = future
+
+    if not leader:
+        return await asyncio.wrap_future(future)
+
+    try:
+        results = await _asearch(query, limit, formats)
+        cache.set(key, results)
+        future.set_result(results)
+        return results
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+
+def _search(query: str, limit: int, formats: list[str]) -> list[dict]:
+    record_search_call()
+    response = get_search_client().search(query=query, limit=limit, formats=formats)
+
+    if not response.success:
+        raise SearchError(getattr(response, "error", None) or f"Search failed for query '{query}'")
+
+    return [dict(result) for result in response.data]
+
+
+async def _asearch(query: str, limit: int, formats: list[str]) -> list[dict]:
+    record_search_call()
+    client = get_async_search_client()
+    if client is None:
+        response = await asyncio.to_thread(get_search_client().search, query=query, limit=limit, formats=formats)
+    else:
+        response = await client.search(query=query, limit=limit, formats=formats)
+
+    if not response.success:
+        raise SearchError(getattr(response, "error", None) or f"Search failed for query '{query}'")
+
+    return [dict(result) for result in response.data]
@@ -0,0 +1,162 @@
+"""
+Near-duplicate topic lookup for research reuse.
+
+Topics are embedded as TF-IDF vectors over their (lightly stemmed, stopword
+free) words, so "Future of AI in content creation" and "AI's future in
+content creation" map to the same vector. A cosine nearest-neighbor search in
+NumPy finds the most similar earlier topic.
+"""
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from cache import CacheStats
+from constants import STOPWORDS
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def terms(topic: str) -> list[str]:
+    return [_stem(word) for word in _WORD.findall(topic.lower()) if word not in STOPWORDS]
+
+
+class TopicIndex:
+    """
+    TF-IDF index of recent topics, each pointing at a cache key. Entries
+    expire after `ttl` seconds (0 disables expiry) and the oldest are dropped
+    beyond `max_entries`. The vectors are rebuilt lazily after changes.
+    """
+
+    def __init__(self, threshold: float = 0.9, ttl: float | None = 3600, max_entries: int = 1000):
+        self.threshold = threshold
+        self.ttl = ttl or None
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        # key -> (term counts, expires at)
+        self._entries: OrderedDict[str, tuple[Counter, float | None]] = OrderedDict()
+        self._keys: list[str] = []
+        self._vocabulary: dict[str, int] = {}
+        self._idf = np.zeros(0)
+        self._matrix = np.zeros((0, 0))
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def add(self, key: str, topic: str):
+        counts = Counter(terms(topic))
+        if not counts:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (counts, time.time() + self.ttl if self.ttl else None)
+            self.stats.sets += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+            self._dirty = True
+
+    def remove(self, key: str):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._dirty = True
+
+    def nearest(self, topic: str) -> tuple[str, float] | None:
+        """The key of the most similar indexed topic and its cosine similarity, if it reaches the threshold."""
+        counts = Counter(terms(topic))
+        with self._lock:
+            self._expire()
+            if self._dirty:
+                self._rebuild()
+            if not counts or not self._keys:
+                self.stats.misses += 1
+                return None
+
+            query = np.zeros(len(self._vocabulary))
+            # Words no indexed topic uses still count towards the query's length
+            unseen_idf = math.log(1 + len(self._keys)) + 1
+            unseen = 0.0
+            for term, count in counts.items():
+                index = self._vocabulary.get(term)
+                if index is None:
+                    unseen += (count * unseen_idf) ** 2
+                else:
+                    query[index] = count * self._idf[index]
+
+            norm = math.sqrt(float(query @ query) + unseen)
+            similarities = self._matrix @ query / norm
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+
+            if similarity < self.threshold:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            return self._keys[best], similarity
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _expire(self):
+        now = time.time()
+        expired = [key for key, (_, expires_at) in self._entries.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+            self.stats.expirations += 1
+        if expired:
+            self._dirty = True
+
+    def _rebuild(self):
+        self._keys = list(self._entries)
+        self._vocabulary = {
+            term: index
+            for index, term in enumerate(sorted({term for counts, _ in self._entries.values() for term in counts}))
+        }
+
+        tf = np.zeros((len(self._keys), len(self._vocabulary)))
+        for row, (counts, _) in enumerate(self._entries.values()):
+            for term, count in counts.items():
+                tf[row, self._vocabulary[term]] = count
+
+        df = np.count_nonzero(tf, axis=0)
+        self._idf = np.log((1 + len(self._keys)) / (1 + df)) + 1
+        matrix = tf * self._idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self._matrix = matrix / np.where(norms == 0, 1, norms)
+        self._dirty = False
+
+
+def build_topic_index() -> TopicIndex | None:
+    """
+    Build the research topic index from SEMANTIC_CACHE (1 or 0),
+    SEMANTIC_THRESHOLD (cosine similarity, default 0.9), SEMANTIC_TTL
+    (seconds, defaults to RESEARCH_CACHE_TTL) and SEMANTIC_MAX_ENTRIES.
+    """
+    if os.getenv("SEMANTIC_CACHE", "1") == "0":
+        return None
+    return TopicIndex(
+        threshold=float(os.getenv("SEMANTIC_THRESHOLD", "0.9")),
+        ttl=float(os.getenv("SEMANTIC_TTL", os.getenv("RESEARCH_CACHE_TTL", "3600"))),
+        max_entries=int(os.getenv("SEMANTIC_MAX_ENTRIES", "1000")),
+    )
+
+
+topic_index = build_topic_index()
@@ -1,11 +1,19 @@
 from crewai.project import CrewBase, agent, task, crew
 from crewai import Agent, Task, Crew
-from pydantic import BaseModel
+from typing import List
+from pydantic import BaseModel, Field
+
+
+class SectionFeedback(BaseModel):
+    part: str  # "title", "subtitle" or "section"
+    section: int  # 1-based section number, 0 for the title and subtitle
+    feedback: str
 
 
 class Score(BaseModel):
     score: int
     reason: str
+    feedback: List[SectionFeedback] = Field(default_factory=list)  # left out for passing scores
 
 
 @CrewBase
@@ -40,12 +48,19 @@ class SeoCrew:
                - Critical weaknesses that need improvement (if score is low)
                - The most important factor affecting the score
 
+            3. Feedback on each part of the blog post that needs improvement:
+               - part: "title", "subtitle" or "section"
+               - section: the section's number counting from 1 (0 for the title and subtitle)
+               - feedback: what is wrong with that part and how to fix it
+               Leave out parts that are already good. Give no feedback if the score is 7 or higher.
+
             Blog post to analyze: {blog_post}
             Target topic: {topic}
             """,
             expected_output="""A Score object with:
             - score: integer from 0-10 rating the SEO quality
-            - reason: string explaining the main factors affecting the score""",
+            - reason: string explaining the main factors affecting the score
+            - feedback: list of the parts that need improvement, each with part, section and feedback""",
             agent=self.seo_expert(),
             output_pydantic=Score,
         )
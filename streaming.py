@@ -0,0 +1,107 @@
+import json
+import re
+import threading
+import time
+from typing import Callable
+
+from pydantic import BaseModel
+
+from instrumentation import record_llm_call
+from limits import llm_slot
+
+
+# Minimum seconds between two partial updates pushed to a callback
+PARTIAL_INTERVAL = 0.1
+
+# "score" once its number is complete, and however much of "reason" has arrived
+_SCORE = re.compile(r'"score"\s*:\s*(\d+)\s*[,}\n]')
+_REASON = re.compile(r'"reason"\s*:\s*"((?:[^"\\]|\\.)*)')
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the shared OpenAI client used for streamed calls, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+
+            _client = OpenAI()
+        return _client
+
+
+def set_client(client):
+    """Replace the shared streaming client, e.g. with a local stand-in."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def stream_structured(
+    model: str,
+    messages: list[dict],
+    response_format: type[BaseModel],
+    on_partial: Callable[[dict], None],
+) -> BaseModel:
+    """
+    Run a chat completion that streams a `response_format` object.
+
+    `on_partial` receives the partially parsed object (a dict with whatever
+    fields have arrived so far) as tokens come in, at most every
+    PARTIAL_INTERVAL seconds, and once more with the complete object. The
+    validated model is returned at the end.
+    """
+    model = model.split("/", 1)[-1]
+    last_push = 0.0
+
+    with llm_slot():
+        with get_client().beta.chat.completions.stream(
+            model=model,
+            messages=messages,
+            response_format=response_format,
+            stream_options={"include_usage": True},
+        ) as stream:
+            for event in stream:
+                if event.type != "content.delta" or not event.parsed:
+                    continue
+                now = time.monotonic()
+                if now - last_push >= PARTIAL_INTERVAL:
+                    last_push = now
+                    on_partial(dict(event.parsed))
+
+            completion = stream.get_final_completion()
+
+    usage = completion.usage
+    record_llm_call(
+        model,
+        usage.prompt_tokens if usage else 0,
+        usage.completion_tokens if usage else 0,
+    )
+
+    result = completion.choices[0].message.parsed
+    if result is None:
+        raise ValueError(f"Streamed response could not be parsed as {response_format.__name__}.")
+
+    on_partial(result.model_dump())
+    return result
+
+
+def partial_score(text: str) -> dict:
+    """
+    The score and (partial) reason found so far in a streaming audit crew's
+    output, whose final answer is a Score JSON object.
+    """
+    fields = {}
+    score = _SCORE.search(text)
+    if score is not None:
+        fields["score"] = int(score.group(1))
+    reason = _REASON.search(text)
+    if reason is not None:
+        raw = reason.group(1)
+        try:
+            fields["reason"] = json.loads('"' + raw.removesuffix("\\") + '"')
+        except json.JSONDecodeError:
+            fields["reason"] = raw
+    return fields
@@ -1,7 +1,7 @@
-import os, re
-
 from crewai.tools import tool
-from firecrawl import FirecrawlApp
+
+from cleaning import clean_results
+from search import SearchError, search
 
 
 @tool
@@ -14,34 +14,13 @@ def web_search_tool(query: str):
     Returns
         A list of search results with the website content in Markdown format.
     """
-    app = FirecrawlApp(api_key=os.getenv("FIRECRAWL_API_KEY"))
-
-    response = app.search(
-        query=query,
-        limit=5,
-        formats=["markdown"],
-    )
-
-    if not response.success:
+    try:
+        results = search(
+            query=query,
+            limit=5,
+            formats=["markdown"],
+        )
+    except SearchError:
         return "Error using tool."
 
-    cleaned_chunks = []
-
-    for result in response.data:
-
-        title = result["title"]
-        url = result["url"]
-        markdown = result["markdown"]
-
-        cleaned = re.sub(r"\\+|\n+", "", markdown).strip()
-        cleaned = re.sub(r"\[[^\]]+\]\([^\)]+\)|https?://[^\s]+", "", cleaned)
-
-        cleaned_result = {
-            "title": title,
-            "url": url,
-            "markdown": cleaned,
-        }
-
-        cleaned_chunks.append(cleaned_result)
-
-    return cleaned_chunks
+    return clean_results(results)
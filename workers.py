@@ -0,0 +1,274 @@
+"""
+Multi-process execution of content pipeline flows.
+
+The web app's process becomes a coordinator: it admits jobs, hands each one
+to the least busy of a set of worker processes and relays the workers'
+progress events back to the jobs. Each worker runs several flows at once on
+a thread pool. The research, search, distill and results caches are shared
+by every process through SQLite in WAL mode. A job whose topic another job is
+still researching is held back, before admission, until that research is
+cached, so a topic is only researched once no matter which worker its jobs
+land on. The near-duplicate topic index (semantic.py) stays per process, so
+research for a similar but not identical topic is only reused by the worker
+that did it.
+
+    WORKER_PROCESSES=4 WORKER_THREADS=4 python app.py
+"""
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import AdmissionController, AdmissionRejected, Ticket
+from cache import build_cache, normalize_topic, set_cache
+from instrumentation import configure_trace_log
+from jobs import BaseJobManager, Job, build_response, load_flow
+from results import store_result
+
+
+# Caches shared by all processes on the box
+SHARED_CACHES = ("research", "search", "distill", "results")
+
+# Step of the last event a worker sends for a job, carrying its result or error
+FINISHED = "finished"
+
+# Seconds between checks that the worker processes are alive
+HEALTH_CHECK_INTERVAL = 1.0
+
+
+def use_shared_caches():
+    """Back this process' in-memory flow caches with SQLite, so every process on the box shares them."""
+    for name in SHARED_CACHES:
+        if os.getenv(f"{name.upper()}_CACHE_BACKEND", "memory").lower() == "memory":
+            set_cache(name, build_cache(name, backend="sqlite"))
+
+
+def _worker_main(tasks, events, threads: int):
+    """Run flows from `tasks` on `threads` threads, reporting their events and results to `events`."""
+    # Ctrl-C is handled by the coordinator, which stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_trace_log()
+    use_shared_caches()
+    if os.getenv("FAKE_BACKENDS") == "1":
+        import fakes
+
+        fakes.install(llm_latency=float(os.getenv("FAKE_LLM_LATENCY", "0.5")))
+    flow_class = load_flow()
+
+    def run(job_id: str, inputs: dict):
+        try:
+            flow = flow_class(on_step=lambda step, data: events.put((job_id, step, data)))
+            flow.kickoff(inputs=inputs)
+            events.put((job_id, FINISHED, {"result": build_response(flow.state)}))
+        except Exception as e:
+            events.put((job_id, FINISHED, {"error": str(e)}))
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="content-pipeline") as pool:
+        while (task := tasks.get()) is not None:
+            pool.submit(run, *task)
+
+
+class Worker:
+    """One worker process, its task queue and the number of jobs assigned to it."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.tasks = None
+        self.load = 0
+
+
+class ProcessJobManager(BaseJobManager):
+    """
+    Runs content pipeline flows in `processes` worker processes (default: one
+    per CPU) with `threads` flows each. The workers are started on the first
+    submitted job and replaced if they die, failing the jobs they were running.
+    """
+
+    def __init__(
+        self,
+        admission: AdmissionController,
+        processes: int | None = None,
+        threads: int = 4,
+        retention: float = 3600,
+    ):
+        super().__init__(retention)
+        self.admission = admission
+        self.processes = processes or os.cpu_count() or 1
+        self.threads = threads
+        self._context = multiprocessing.get_context("spawn")
+        self._events = None
+        self._workers: list[Worker] = []
+        # job id -> (job, admission ticket, worker running it)
+        self._assigned: dict[str, tuple[Job, Ticket, Worker]] = {}
+        # normalized topic -> job researching it, and the (job, client) waiting
+        # for that research. Waiting jobs hold no admission ticket.
+        self._researching: dict[str, Job] = {}
+        self._waiting: dict[str, list[tuple[Job, str]]] = {}
+        self._coordinator_lock = threading.Lock()
+        self._stopping = False
+        # The coordinator serves finished content from the shared results cache
+        use_shared_caches()
+
+    def submit(self, inputs: dict, client: str = "anonymous", force: bool = False) -> Job:
+        """
+        Queue a flow run, or finish the job at once from the results cache.
+        Raises AdmissionRejected when the admission queue turns it away.
+        """
+        self._start()
+        cached = self._cached(inputs, force)
+        if cached is not None:
+            return cached
+
+        job = Job(inputs)
+        self._enqueue(job, client)
+        return self._add(job)
+
+    def stats(self) -> dict:
+        with self._coordinator_lock:
+            return {
+                "processes": len(self._workers),
+                "threads": self.threads,
+                "load": [worker.load for worker in self._workers],
+                "researching": len(self._researching),
+                "waiting_for_research": sum(len(jobs) for jobs in self._waiting.values()),
+            }
+
+    def shutdown(self):
+        self._stopping = True
+        for worker in self._workers:
+            worker.tasks.put(None)
+        for worker in self._workers:
+            worker.process.join()
+
+    def _start(self):
+        with self._coordinator_lock:
+            if self._workers:
+                return
+            self._events = self._context.Queue()
+            self._workers = [Worker(index) for index in range(self.processes)]
+            for worker in self._workers:
+                self._start_worker(worker)
+        threading.Thread(target=self._relay_events, name="worker-events", daemon=True).start()
+
+    def _start_worker(self, worker: Worker):
+        worker.tasks = self._context.Queue()
+        worker.load = 0
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(worker.tasks, self._events, self.threads),
+            name=f"content-pipeline-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+
+    def _enqueue(self, job: Job, client: str):
+        """
+        Admit a job, or hold it without a ticket while another job researches
+        its topic. Raises AdmissionRejected when the job is turned away.
+        """
+        topic = normalize_topic(job.inputs.get("topic", ""))
+        with self._coordinator_lock:
+            if topic in self._researching:
+                # Held jobs count against the admission queue's bound
+                held = sum(len(jobs) for jobs in self._waiting.values())
+                if held >= self.admission.max_queue:
+                    raise AdmissionRejected("Server is busy, try again later")
+                self._waiting.setdefault(topic, []).append((job, client))
+                return
+            self._researching[topic] = job
+
+        def timed_out(ticket: Ticket):
+            job.finish(error="Timed out waiting in the queue")
+            self._researched(job)
+
+        try:
+            self.admission.admit(
+                client,
+                job.inputs,
+                on_grant=lambda ticket: self._dispatch(job, ticket),
+                on_timeout=timed_out,
+            )
+        except AdmissionRejected:
+            self._researched(job)
+            raise
+
+    def _dispatch(self, job: Job, ticket: Ticket):
+        """Send an admitted job to the least busy worker."""
+        with self._coordinator_lock:
+            worker = min(self._workers, key=lambda w: w.load)
+            worker.load += 1
+            self._assigned[job.id] = (job, ticket, worker)
+
+        job.status = "running"
+        job.add_event("started", job.inputs)
+        worker.tasks.put((job.id, job.inputs))
+
+    def _researched(self, job: Job):
+        """Release the jobs waiting for `job`'s research, which is cached now (or failed)."""
+        topic = normalize_topic(job.inputs.get("topic", ""))
+        with self._coordinator_lock:
+            if self._researching.get(topic) is not job:
+                return
+            del self._researching[topic]
+            waiting = self._waiting.pop(topic, [])
+        # The first becomes the new researcher and finds the research cached
+        for waiting_job, client in waiting:
+            try:
+                self._enqueue(waiting_job, client)
+            except AdmissionRejected as e:
+                waiting_job.finish(error=str(e))
+
+    def _relay_events(self):
+        next_check = time.monotonic() + HEALTH_CHECK_INTERVAL
+        while True:
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + HEALTH_CHECK_INTERVAL
+            try:
+                job_id, step, data = self._events.get(timeout=HEALTH_CHECK_INTERVAL)
+            except queue.Empty:
+                continue
+
+            if step == FINISHED:
+                self._finish(job_id, **data)
+                continue
+
+            with self._coordinator_lock:
+                assigned = self._assigned.get(job_id)
+            if assigned is None:
+                continue
+            job = assigned[0]
+            job.add_event(step, data)
+            # Generating starts once the research is done and cached
+            if step == "generate":
+                self._researched(job)
+
+    def _finish(self, job_id: str, result: dict | None = None, error: str | None = None):
+        with self._coordinator_lock:
+            assigned = self._assigned.pop(job_id, None)
+            if assigned is None:
+                return
+            job, ticket, worker = assigned
+            worker.load -= 1
+
+        if result is not None:
+            store_result(job.inputs, result)
+        job.finish(result=result, error=error)
+        self.admission.release(ticket)
+        self._researched(job)
+
+    def _check_workers(self):
+        """Fail the jobs of workers that died and start replacements."""
+        for worker in self._workers:
+            if self._stopping or worker.process.is_alive():
+                continue
+            with self._coordinator_lock:
+                lost = [job_id for job_id, (_, _, assigned) in self._assigned.items() if assigned is worker]
+            for job_id in lost:
+                self._finish(job_id, error=f"Worker process exited with code {worker.process.exitcode}")
+            print(f"⚠️ Worker {worker.index} exited with code {worker.process.exitcode}, restarting it...")
+            self._start_worker(worker)